@@ -5,33 +5,23 @@
     @Author: LRB
     @Date: 19.02.2025'''
 
-import pandas as pd
-from datetime import date
-import openpyxl
-
-def load_baby_sheet(path: str, sheet: str):
-    return pd.read_excel(path, sheet_name = sheet, header = None)
+from __future__ import annotations
 
-def load_baby_sheet_notes(path: str, sheet: str):
-    workbook = openpyxl.load_workbook(path)
-    worksheet = workbook[sheet]
-    normal = pd.DataFrame(worksheet.values) # for column labels
-    
-    for row in worksheet.iter_rows():
-        for cell in row:
-            cell_comment = cell.comment
-            if cell_comment:
-                cell.value = cell_comment.text
-            else:
-                cell.value = None
-    
-    notes = pd.DataFrame(worksheet.values)
-    notes.iloc[:, 1] = normal.iloc[:, 1] + "_notes" # adds column labels back
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
 
-    return notes
+from lazy_imports import LazyModule
+from workbook_session import WorkbookSession
+from mapping_registry import REGISTRY
+from text_classifier import DIET, FEEDING, PROBIOTICS
+from value_normalization import normalize_frame, BABY_VALUE_SPEC
+from typed_schema import apply_types, extraction_types
+from sheet_transform import merge_normal_notes, set_col_names, deleting_cols, col_type_changes # shared with the general sheet
+from duplicate_rules import DUPLICATE_RULES, load_duplicate_rules, apply_duplicate_rules
+from parquet_output import write_parquet
+from pipeline_instrumentation import run_step
 
-def merge_normal_notes(df1: pd.DataFrame, df2: pd.DataFrame):
-    return pd.concat([df1, df2], axis = 0)
+pd = LazyModule('pandas')
 
 def rough_clean_baby(df: pd.DataFrame):
     df.drop(df.columns[0], axis = 1, inplace=True) # rids english labs
@@ -57,140 +47,89 @@ def add_info_cols(df: pd.DataFrame, sheet: str):
 
     return pd.concat([df, baby], axis = 1, ignore_index = True)
 
-def set_col_names(df: pd.DataFrame, path: str):
+def prepare_baby_sheet(sheet_path: str, sheet: str, renaming_path: str, deleting_path: str, session: WorkbookSession = None):
 
-    df.columns = df.iloc[0]
-    df = df.iloc[1:, :].copy()
-    df.reset_index(drop = True, inplace = True)
+    if session is None: # single sheet call, otherwise the session of the whole run is reused
+        with WorkbookSession(sheet_path) as session:
+            return prepare_baby_sheet(sheet_path, sheet, renaming_path, deleting_path, session)
 
-    new_names_notes = {}
-    new_names = dict(pd.read_excel(path).values) # has to be excel bc of sonderzeichen
-    for key, value in new_names.items(): new_names_notes[key + "_notes"] = value + "_notes"
-    df.rename(new_names, axis = 1, inplace = True, errors = 'ignore')
-    df.rename(new_names_notes, axis = 1, inplace = True, errors = 'ignore')
+    df = rough_clean_baby(merge_normal_notes(*session.read_sheet(sheet)))
+    df = add_info_cols(df, sheet)
+    df = set_col_names(df, renaming_path)
+    df = deleting_cols(df, deleting_path)
 
     return df
 
-def deleting_cols(df: pd.DataFrame, path: str):
+def merge_babies(df_list: list):
+    return apply_types(pd.concat(df_list, axis = 0, ignore_index = True), extraction_types()) # baby and time_point as categoricals
 
-    delete_names = pd.read_excel(path)["Old"].to_list() # has to be excel bc of sonderzeichen
-    delete_names_notes = [name + "_notes" for name in delete_names]
-    df.drop(delete_names, axis = 1, inplace = True, errors = 'ignore')
-    df.drop(delete_names_notes, axis = 1, inplace = True, errors = 'ignore')
+def prepare_baby_sheets(path: str, sheets: list, renaming_path: str, deleting_path: str, session: WorkbookSession = None):
 
-    return df
+    if session is None:
+        with WorkbookSession(path) as session: # workbook is only parsed once for all babies
+            return prepare_baby_sheets(path, sheets, renaming_path, deleting_path, session)
 
-def prepare_baby_sheet(sheet_path: str, sheet: str, renaming_path: str, deleting_path: str):
-    
-    df = rough_clean_baby(merge_normal_notes(load_baby_sheet(sheet_path, sheet), load_baby_sheet_notes(sheet_path, sheet)))
-    df = add_info_cols(df, sheet)
-    df = set_col_names(df, renaming_path)
-    df = deleting_cols(df, deleting_path)
+    return [prepare_baby_sheet(path, sheet, renaming_path, deleting_path, session) for sheet in sheets]
 
-    return df
+def chunk_sheets(sheets: list, n_chunks: int):
+    # contiguous chunks so that the merged babies keep the serial order
 
-def merge_babies(df_list: list):
-    return pd.concat(df_list, axis = 0, ignore_index = True)
+    size, rest = divmod(len(sheets), n_chunks)
+    chunks, start = [], 0
+    for i in range(n_chunks):
+        end = start + size + (i < rest)
+        chunks.append(sheets[start:end])
+        start = end
 
-def run_through_babies(first: int, last: int, skips: list, path: str, renaming_path: str, deleting_path: str):
+    return [chunk for chunk in chunks if chunk]
 
-    babies_list = []
+def run_through_babies(first: int, last: int, skips: list, path: str, renaming_path: str, deleting_path: str, workers: int = 1,
+                       session: WorkbookSession = None):
+    # session: open session of the whole run (serial only, the workers open their own)
 
-    for i in range(first, last + 1):
-        if i in skips:
-            continue
-        sheet = f'B{i:03}'
-        df = prepare_baby_sheet(path, sheet, renaming_path, deleting_path)
-        babies_list.append(df)
-    
-    return merge_babies(babies_list)
+    sheets = [f'B{i:03}' for i in range(first, last + 1) if i not in skips]
 
-def edit_probiotics(df: pd.DataFrame):
+    if workers <= 1:
+        return merge_babies(prepare_baby_sheets(path, sheets, renaming_path, deleting_path, session))
 
-    probiotics_m = pd.Series(df['probiotics_notes'].str.contains(r'mutter', case = False), name = 'probiotics_mother')
-    probiotics_s = pd.Series(df['probiotics_notes'].str.contains(r'kind', case = False), name = 'probiotics_sib1')
-    probiotics_t = pd.Series(df['probiotics_notes'].str.contains(r'child', case = False), name = 'probiotics_sib2')
-    probiotics_f = pd.Series(df['probiotics_notes'].str.contains(r'vater', case = False), name = 'probiotics_father')
-    probiotics_b = pd.Series(df['probiotics_notes'].str.contains(r'baby', case = False), name = 'probiotics_baby1')
-    probiotics_c = pd.Series(df['probiotics_notes'].str.contains(r'infant', case = False), name = 'probiotics_baby2')
+    # every worker opens its own session and prepares one chunk of sheets
+    REGISTRY.preload([renaming_path], [deleting_path])
+    chunks = chunk_sheets(sheets, workers)
+    with ProcessPoolExecutor(max_workers = len(chunks)) as executor:
+        results = executor.map(prepare_baby_sheets, [path] * len(chunks), chunks, [renaming_path] * len(chunks), [deleting_path] * len(chunks))
+        babies_list = [df for chunk in results for df in chunk]
 
-    probiotics_bifido = pd.Series(df["probiotics_notes"].str.contains(r"[\S\s]*bifido[\S\s]*", case = False, regex = True), name = "probiotics_bifido")
-    probiotics_lakt = pd.Series(df["probiotics_notes"].str.contains(r"[\S\s]*lakt[\S\s]*", case = False, regex = True), name = "probiotics_lakt")
-    probiotics_ecoli = pd.Series(df["probiotics_notes"].str.contains(r"[\S\s]*coli[\S\s]*", case = False, regex = True), name = "probiotics_e_coli")
+    return merge_babies(babies_list)
 
-    return pd.concat([df, probiotics_b, probiotics_bifido, probiotics_ecoli, probiotics_f, probiotics_lakt, probiotics_m, probiotics_s, probiotics_t, probiotics_c], axis = 1)
+def edit_probiotics(df: pd.DataFrame):
 
-def feeding_mode_conditional(row):
+    probiotics = PROBIOTICS.classify(df['probiotics_notes']) # all members and strains in one pass over the notes
 
-    mode = []
-    if row['breastfed_baby1']:
-        mode.append('breastfed')
-    if row['formula_baby1']:
-        mode.append('formula')
-    if row['solids_baby1']:
-           mode.append('solids')
-    
-    return mode
+    return pd.concat([df, probiotics[['probiotics_baby1', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_father', 'probiotics_lakt', 'probiotics_mother', 'probiotics_sib1', 'probiotics_sib2', 'probiotics_baby2']]], axis = 1)
 
 def edit_baby_feeding_mode(df: pd.DataFrame):
 
     # doing this for only baby1 under the assumption twins are fed identically
     temp_baby1 = pd.Series(df['food_baby1'].astype(str) + df['food_baby1_notes'].astype(str)) # this changes na values... 
 
-    bf_baby1 = pd.Series(temp_baby1.str.contains(r'gestil', case = False), name = 'breastfed_baby1')
-    formula_baby1 = pd.Series(temp_baby1.str.contains(r'milch|pre|aptamil', case = False, regex = True), name = 'formula_baby1')
-    solids_baby1 = pd.Series(temp_baby1.str.contains(r'beikost|brei', case = False, regex = True), name = 'solids_baby1')
+    feeding = FEEDING.classify(temp_baby1).add_suffix('_baby1') # breastfed_baby1, formula_baby1, solids_baby1
 
-    df = pd.concat([df, bf_baby1, formula_baby1, solids_baby1], axis = 1)
+    df = pd.concat([df, feeding], axis = 1)
 
-    df['feeding_mode'] = df.apply(feeding_mode_conditional, axis = 1)
+    df['feeding_mode'] = FEEDING.label_lists(temp_baby1)
 
     return df
 
-def diet_condition(notes):
-
-    notes = notes.lower()
-    diet = []
-
-    if 'fleischarm' in notes or 'wenig fleisch' in notes:
-        diet.append('less meat')
-    if 'vege' in notes:
-        diet.append('vegetarian')
-    if 'vega' in notes:
-        diet.append('vegan')
-    if 'salz' in notes:
-        diet.append('less salt')
-    if 'zucker' in notes:
-        diet.append('low sugar')
-    if 'carb' in notes or 'kohlenhydr' in notes:
-        diet.append('low carb')
-    if 'eiwei' in notes:
-        diet.append('little egg???')
-    if 'pesce' in notes:
-        diet.append('pescetarian')
-    
-    return diet
-
 def edit_baby_diet(df: pd.DataFrame):
 
     # works under the assumption that diet with twins is equal!
     df['special_diet_baby_notes'] = df['food_baby1'].astype(str) + df['food_baby2'].astype(str) + df['food_baby1_notes'].astype(str) + df['food_baby2_notes'].astype(str) + df['diet_baby'].astype(str) + df['diet_baby_notes'].astype(str)
-    df['special_diet_baby'] = df['special_diet_baby_notes'].apply(diet_condition)
+    df['special_diet_baby'] = DIET.label_lists(df['special_diet_baby_notes'])
 
     return df
 
 def replacing_values_baby(df: pd.DataFrame):
-
-    replace = ['.*[Jj][Aa].*', '.*[Nn][Ee][Ii][Nn].*', '.*[Jj]eden.*', '.*[Hh]öchstens.*', '.*[Mm]ehrmal.*']
-    val = ['True', 'False', 'min. once per day', 'max. once per week', 'several times a week']
-    
-    for i in range(len(replace)):
-        df = df.replace(to_replace = replace[i], regex = True, value = val[i])
-
-    return df
-
-def col_type_changes(df: pd.DataFrame):
-    return df.convert_dtypes()
+    return normalize_frame(df, BABY_VALUE_SPEC) # only the yes/no and frequency columns, notes and dates are left alone
 
 def edit_travel_time(df: pd.DataFrame):
 
@@ -204,29 +143,40 @@ def edit_travel_time(df: pd.DataFrame):
 
     return pd.concat([df, father, mother, sib1, sib2, baby1, baby2], axis = 1)
 
-def removing_duplicates(df: pd.DataFrame):
+def removing_duplicates(df: pd.DataFrame, rules_path: str = DUPLICATE_RULES):
+    return apply_duplicate_rules(df, load_duplicate_rules(rules_path)) # duplicates/retaken samples, one rule per line in the rule file
+
+def derive_baby_cols(df: pd.DataFrame, log = None):
+    # row wise steps, every row only depends on itself so these can also run per baby
+
+    df = run_step(log, edit_baby_diet, df)
+    df = run_step(log, edit_baby_feeding_mode, df)
+    df = run_step(log, edit_probiotics, df)
+    df = run_step(log, replacing_values_baby, df)
+
+    return df
+
+def finalize_baby(df: pd.DataFrame, log = None):
+    # column wise steps, dtypes are inferred over all babies
 
-    # for now hard-coded removal of duplicates/retaken samples 
-    df = df[~((df['baby']=='B001')&(df['probe_date_mpi'].notna())&(df['time_point']=='9Monate'))]
-    df = df[~((df['baby']=='B016')&(df['time_point']=='12Monate'))]
-    df = df[~((df['baby']=='B027')&(df['time_point']=='12Monate'))]
-    df = df[~((df['baby']=='B034')&(df['weight_mother']==75))] # note that this is a strange duplicate with fixed samples and variable samples separated, this is keeping the variable version
+    df = run_step(log, col_type_changes, df)
+    df = run_step(log, edit_travel_time, df)
+    df = run_step(log, removing_duplicates, df)
 
     return df
 
-def clean_and_edit_baby(df: pd.DataFrame):
+def clean_and_edit_baby(df: pd.DataFrame, log = None):
+    # log: optional RunLog that times every step
     
-    df = edit_baby_diet(df)
-    df = edit_baby_feeding_mode(df)
-    df = edit_probiotics(df)
-    df = replacing_values_baby(df)
-    df = col_type_changes(df)
-    df = edit_travel_time(df)
-    df = removing_duplicates(df)
+    df = derive_baby_cols(df, log)
+    df = finalize_baby(df, log)
 
     return df
 
-def save_baby_sheets(df: pd.DataFrame, path: str):
+def save_baby_sheets(df: pd.DataFrame, path: str, file_format: str = 'csv', partition_cols: list = None):
     
     today = date.today().strftime('%Y%m%d')
-    df.to_csv(f'{path}{today}_baby_sheets.csv', index = False)
\ No newline at end of file
+    if file_format == 'parquet': # keeps the dtypes and the list columns, partition_cols e.g. ['baby'] or ['time_point']
+        write_parquet(df, f'{path}{today}_baby_sheets' if partition_cols else f'{path}{today}_baby_sheets.parquet', partition_cols)
+    else:
+        df.to_csv(f'{path}{today}_baby_sheets.csv', index = False)
\ No newline at end of file
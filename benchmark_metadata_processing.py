@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Benchmarks of the babybiome family metadata ETL
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import duckdb
+import pandas as pd
+
+from babysheet_extract_transform import run_through_babies, clean_and_edit_baby
+from general_sheet_extract_transform import prepare_general, clean_and_edit_general
+from family_database import load_connection, unpivot_members, load_general_sheet
+from execute_metadata_processing import load_baby_tables, run_pipeline, BABY_RENAMING, BABY_DELETING, GENERAL_RENAMING, GENERAL_DELETING
+from mapping_registry import REGISTRY
+from pipeline_instrumentation import RunLog
+from cohort_queries import CohortQueries
+from synthetic_workbook import write_synthetic_workbook
+
+SCALES = [10, 100, 999] # ~1000 families, the B### ids end at B999
+
+# command line invocations that do not extract anything, {database} is a small loaded cohort
+STARTUP_COMMANDS = {'help': ['execute_metadata_processing.py', '--help'],
+                    'bundle_check': ['mapping_registry.py', 'check'],
+                    'lookup_family': ['sample_lookup.py', '{database}', '--family', 'B001'],
+                    'lookup_tables': ['-c', 'from mapping_registry import REGISTRY; [REGISTRY.table(*source) for source in REGISTRY.bundle_sources()]']}
+# reference only, what every run used to pay before any work: all lookup tables parsed from the xlsx and csv files
+PARSE_COMMAND = ['-c', 'from mapping_registry import *; [MappingRegistry.readers[kind](path) for path, kind in REGISTRY.bundle_sources()]']
+
+def time_call(func, *args, repeats: int = 1, **kwargs):
+    # best of the repeats, first result is returned alongside
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+def benchmark_workers(path: str, first: int, last: int, skips: list, renaming_path: str, deleting_path: str, worker_counts: list, repeats: int = 1):
+    # extraction time against the number of worker processes, output is checked against the serial run
+
+    rows = []
+    serial_time, serial = time_call(run_through_babies, first, last, skips, path, renaming_path, deleting_path, repeats = repeats)
+    rows.append({'workers': 1, 'seconds': serial_time, 'speedup': 1.0})
+
+    for workers in worker_counts:
+        if workers <= 1:
+            continue
+        seconds, df = time_call(run_through_babies, first, last, skips, path, renaming_path, deleting_path, workers = workers, repeats = repeats)
+        pd.testing.assert_frame_equal(serial, df)
+        rows.append({'workers': workers, 'seconds': seconds, 'speedup': serial_time / seconds})
+
+    return pd.DataFrame(rows)
+
+def cohort_workbook(workdir: str, families: int, seed: int = 0):
+    # synthetic workbook with one baby sheet per family, written once per size and seed
+
+    os.makedirs(workdir, exist_ok = True)
+    path = os.path.join(workdir, f'cohort_{families}_{seed}.xlsx')
+    if not os.path.exists(path):
+        write_synthetic_workbook(path, families, families, seed)
+
+    return path
+
+def load_database(babies: pd.DataFrame, general: pd.DataFrame):
+    # in memory duckdb, so only the unpivot and the inserts are timed
+
+    connection = load_connection(':memory:')
+    load_baby_tables(unpivot_members(babies), connection)
+    load_general_sheet(general, connection)
+    connection.close()
+
+def benchmark_scale(path: str, families: int, repeats: int = 1):
+    # stage -> best seconds, each clean step gets a fresh copy of its input
+
+    seconds = {}
+    seconds['extraction'], babies = time_call(run_through_babies, 1, families, [], path, BABY_RENAMING, BABY_DELETING, repeats = repeats)
+    seconds['clean_and_edit_baby'], babies = time_call(lambda: clean_and_edit_baby(babies.copy()), repeats = repeats)
+    seconds['prepare_general'], general = time_call(prepare_general, path, GENERAL_RENAMING, GENERAL_DELETING, repeats = repeats)
+    seconds['clean_and_edit_general'], general = time_call(lambda: clean_and_edit_general(general.copy()), repeats = repeats)
+    seconds['load_database'], _ = time_call(load_database, babies, general, repeats = repeats)
+
+    return seconds
+
+def benchmark_suite(scales: list, workdir: str, repeats: int = 1, seed: int = 0):
+
+    rows = []
+    for families in scales:
+        path = cohort_workbook(workdir, families, seed)
+        for stage, seconds in benchmark_scale(path, families, repeats).items():
+            rows.append({'families': families, 'stage': stage, 'seconds': round(seconds, 4)})
+
+    return pd.DataFrame(rows)
+
+def save_baseline(result: pd.DataFrame, path: str):
+
+    with open(path, 'w') as file:
+        json.dump(result.to_dict(orient = 'records'), file, indent = 2)
+
+def find_regressions(result: pd.DataFrame, baseline_path: str, tolerance: float = 0.25, slack: float = 0.05):
+    # stages slower than baseline * (1 + tolerance), slack seconds keep the small sizes from failing on noise
+
+    with open(baseline_path) as file:
+        baseline = pd.DataFrame(json.load(file))
+
+    compared = result.merge(baseline, on = ['families', 'stage'], suffixes = ('', '_baseline'))
+    compared['ratio'] = compared['seconds'] / compared['seconds_baseline']
+    slower = compared['seconds'] > compared['seconds_baseline'] * (1 + tolerance) + slack
+
+    return compared[slower]
+
+def startup_database(workdir: str, seed: int = 0):
+    # 10 families, loaded once per seed
+
+    path = os.path.join(workdir, f'startup_{seed}.duckdb')
+    if not os.path.exists(path):
+        run_pipeline(cohort_workbook(workdir, 10, seed), 1, 10, [], database = path, log = RunLog(trace_memory = False))
+
+    return path
+
+def time_startup(args: list, repeats: int = 5):
+    # wall time of a fresh interpreter in the directory of the mapping files, median of the repeats
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd = os.path.dirname(os.path.abspath(__file__)), check = True,
+                       stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+def benchmark_startup(workdir: str, repeats: int = 5, seed: int = 0):
+
+    database = os.path.abspath(startup_database(workdir, seed))
+    if REGISTRY.stale_sources():
+        REGISTRY.build_bundle()
+
+    rows = [{'command': name, 'seconds': round(time_startup([arg.format(database = database) for arg in args], repeats), 4), 'bounded': True}
+            for name, args in STARTUP_COMMANDS.items()]
+    rows.append({'command': 'parse_lookup_files', 'seconds': round(time_startup(PARSE_COMMAND, repeats), 4), 'bounded': False})
+
+    return pd.DataFrame(rows)
+
+def cohort_database(workdir: str, families: int, seed: int = 0):
+    # loaded synthetic cohort, once per size and seed
+
+    path = os.path.join(workdir, f'cohort_{families}_{seed}.duckdb')
+    if not os.path.exists(path):
+        run_pipeline(cohort_workbook(workdir, families, seed), 1, families, [], database = path, log = RunLog(trace_memory = False))
+
+    return path
+
+def unindexed_copy(path: str):
+    # the same tables without the index of collected_samples.family
+
+    copy = path.replace('.duckdb', '_unindexed.duckdb')
+    if not os.path.exists(copy):
+        shutil.copy(path, copy)
+        connection = duckdb.connect(copy)
+        connection.sql('DROP INDEX collected_samples_family')
+        connection.close()
+
+    return copy
+
+def time_queries(path: str, families: int, repeats: int = 200, seed: int = 0):
+    # latency of every prepared query with parameters drawn per call, the same draws for every database of a seed
+
+    connection = duckdb.connect(path, read_only = True)
+    queries = CohortQueries(connection)
+    draw = random.Random(seed)
+    ids = [f'B{i:03}' for i in range(1, families + 1)]
+    time_points = list(queries.days)
+    calls = {'family_samples': lambda: queries.family_samples(draw.choice(ids)),
+             'time_point_samples': lambda: queries.family_samples(draw.choice(ids), draw.choice(time_points)),
+             'antibiotic_free': lambda: queries.antibiotic_free(*sorted(draw.sample(time_points, 2), key = time_points.index), ['B', 'C']),
+             'feeding_groups': lambda: queries.feeding_groups(draw.choice(time_points))}
+
+    rows = []
+    for name, call in calls.items():
+        call() # first call after preparing
+        times, returned = [], 0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            returned += call().num_rows
+            times.append(time.perf_counter() - start)
+        rows.append({'query': name, 'median_ms': round(statistics.median(times) * 1000, 3),
+                     'p95_ms': round(statistics.quantiles(times, n = 20)[-1] * 1000, 3), 'mean_rows': round(returned / repeats, 1)})
+    queries.close()
+    connection.close()
+
+    return pd.DataFrame(rows)
+
+def benchmark_cohort_queries(workdir: str, families: int, repeats: int = 200, seed: int = 0):
+
+    os.makedirs(workdir, exist_ok = True)
+    path = cohort_database(workdir, families, seed)
+    indexed = time_queries(path, families, repeats, seed)
+    unindexed = time_queries(unindexed_copy(path), families, repeats, seed)
+    samples = duckdb.connect(path, read_only = True)
+    indexed.insert(0, 'samples', samples.sql('SELECT count(*) FROM collected_samples').fetchone()[0])
+    samples.close()
+
+    return indexed.merge(unindexed[['query', 'median_ms', 'p95_ms']], on = 'query', suffixes = ('', '_unindexed'))
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Benchmarks of the babybiome metadata ETL')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    workers = commands.add_parser('workers', help = 'extraction time against the number of worker processes')
+    workers.add_argument('workbook')
+    workers.add_argument('--first', type = int, default = 1)
+    workers.add_argument('--last', type = int, required = True)
+    workers.add_argument('--skips', type = int, nargs = '*', default = [])
+    workers.add_argument('--renaming', default = BABY_RENAMING)
+    workers.add_argument('--deleting', default = BABY_DELETING)
+    workers.add_argument('--workers', type = int, nargs = '*', default = [2, 4, 8])
+    workers.add_argument('--repeats', type = int, default = 1)
+
+    suite = commands.add_parser('suite', help = 'stage times on synthetic cohorts, optionally checked against a baseline')
+    suite.add_argument('--scales', type = int, nargs = '*', default = SCALES, help = 'number of families')
+    suite.add_argument('--workdir', default = '.benchmark_cohorts', help = 'generated workbooks are kept here')
+    suite.add_argument('--seed', type = int, default = 0)
+    suite.add_argument('--repeats', type = int, default = 1)
+    suite.add_argument('--baseline', help = 'JSON baseline, exits with 1 on regressions')
+    suite.add_argument('--save-baseline', help = 'writes the times as the new JSON baseline')
+    suite.add_argument('--tolerance', type = float, default = 0.25)
+
+    startup = commands.add_parser('startup', help = 'cold start of the commands that do not extract anything')
+    startup.add_argument('--workdir', default = '.benchmark_cohorts')
+    startup.add_argument('--seed', type = int, default = 0)
+    startup.add_argument('--repeats', type = int, default = 5)
+    startup.add_argument('--max-seconds', type = float, default = 0.5, help = 'exits with 1 if a command takes longer')
+    cohort = commands.add_parser('queries', help = 'latency of the prepared cohort selection queries on a loaded synthetic cohort')
+    cohort.add_argument('--families', type = int, default = SCALES[-1])
+    cohort.add_argument('--workdir', default = '.benchmark_cohorts')
+    cohort.add_argument('--seed', type = int, default = 0)
+    cohort.add_argument('--repeats', type = int, default = 200)
+    args = parser.parse_args()
+
+    if args.command == 'queries':
+        print(benchmark_cohort_queries(args.workdir, args.families, args.repeats, args.seed).to_string(index = False))
+        return
+
+    if args.command == 'startup':
+        result = benchmark_startup(args.workdir, args.repeats, args.seed)
+        print(result.to_string(index = False))
+        slow = result[result['bounded'] & (result['seconds'] > args.max_seconds)]
+        if not slow.empty:
+            print(f'slower than {args.max_seconds} s: ' + ', '.join(slow['command']))
+            sys.exit(1)
+        return
+
+    if args.command == 'workers':
+        result = benchmark_workers(args.workbook, args.first, args.last, args.skips, args.renaming, args.deleting, args.workers, args.repeats)
+        print(result.to_string(index = False))
+        return
+
+    result = benchmark_suite(args.scales, args.workdir, args.repeats, args.seed)
+    print(result.pivot(index = 'stage', columns = 'families', values = 'seconds').to_string())
+    if args.save_baseline:
+        save_baseline(result, args.save_baseline)
+    if args.baseline:
+        regressions = find_regressions(result, args.baseline, args.tolerance)
+        if not regressions.empty:
+            print('regressions:')
+            print(regressions.to_string(index = False))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
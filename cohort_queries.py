@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Prepared cohort selection queries over the loaded babybiome tables (samples by family and time point, antibiotic free windows,
+    feeding groups at a time point), results are Arrow tables
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import itertools
+
+from snapshot_loading import snapshot_schema
+from typed_schema import TIME_CONVERSIONS, time_point_days, enum_values
+
+# name -> (parameters, query), prepared once per connection, {schema} is main or the schema of an older snapshot
+# time points are compared as time_point_days (days of time_point_conversions.csv), families through the index of collected_samples
+COHORT_QUERIES = {
+    # all samples of a family in chronological order
+    'family_samples': (['family'], '''
+        SELECT s.*, a.taken AS antibiotics_taken, p.taken AS probiotics_taken
+        FROM {schema}.collected_samples s
+        LEFT JOIN {schema}.antibiotics a USING (sample_id)
+        LEFT JOIN {schema}.probiotics p USING (sample_id)
+        WHERE s.family = $family
+        ORDER BY s.time_point_days, s.member'''),
+
+    # samples of a family at one time point
+    'time_point_samples': (['family', 'days'], '''
+        SELECT s.*, a.taken AS antibiotics_taken, p.taken AS probiotics_taken
+        FROM {schema}.collected_samples s
+        LEFT JOIN {schema}.antibiotics a USING (sample_id)
+        LEFT JOIN {schema}.probiotics p USING (sample_id)
+        WHERE s.family = $family AND s.time_point_days = $days
+        ORDER BY s.member'''),
+
+    # members without antibiotics at every sampled time point of the window, an unknown answer does not count as antibiotic free
+    'antibiotic_free': (['first_days', 'last_days', 'members'], '''
+        SELECT s.family, s.member, count(*) AS samples, min(s.time_point_days) AS first_days, max(s.time_point_days) AS last_days,
+               list(s.sample_id ORDER BY s.time_point_days) AS sample_ids
+        FROM {schema}.collected_samples s
+        JOIN {schema}.antibiotics a USING (sample_id)
+        WHERE s.time_point_days BETWEEN $first_days AND $last_days
+              AND ($members IS NULL OR list_contains($members, CAST(s.member AS varchar)))
+        GROUP BY s.family, s.member
+        HAVING bool_and(coalesce(NOT a.taken, false))
+        ORDER BY s.family, s.member'''),
+
+    # feeding of the babies at one time point, mixed if formula and breast milk, probiotics and antibiotics as confounders
+    'feeding_groups': (['days'], '''
+        SELECT s.sample_id, s.family, s.member, s.time_point, s.time_point_days, d.breastmilk, d.formula, d.solids,
+               CASE WHEN d.formula AND d.breastmilk THEN 'mixed' WHEN d.formula THEN 'formula' WHEN d.breastmilk THEN 'breastfed' END AS feeding,
+               p.taken AS probiotics_taken, a.taken AS antibiotics_taken
+        FROM {schema}.collected_samples s
+        JOIN {schema}.baby_diet d USING (sample_id)
+        LEFT JOIN {schema}.probiotics p USING (sample_id)
+        LEFT JOIN {schema}.antibiotics a USING (sample_id)
+        WHERE s.time_point_days = $days
+        ORDER BY s.family, s.member''')}
+
+INSTANCES = itertools.count(1) # suffix of the statement names, duckdb scopes them to the connection and not to the instance
+
+def sql_literal(value):
+    # duckdb does not bind python values to EXECUTE, the parameters of a call are passed as literals
+
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(sql_literal(item) for item in value) + ']'
+    return enum_values([value])
+
+class CohortQueries:
+    # one connection, e.g. read only, the statements stay prepared until close() or as long as it is open
+    # several instances (e.g. the current and an older snapshot) can share a connection, each prepares its own statements
+
+    def __init__(self, connection, run_id: str = None, times_path: str = TIME_CONVERSIONS):
+        self.connection = connection
+        suffix = next(INSTANCES)
+        self.statements = {name: f'{name}_{suffix}' for name in COHORT_QUERIES}
+        self.days = time_point_days(times_path)
+        schema = snapshot_schema(connection, run_id) if run_id is not None else 'main'
+
+        columns = connection.sql(f'''SELECT column_name FROM information_schema.columns WHERE table_catalog = current_database()
+                                     AND table_schema = '{schema}' AND table_name = 'collected_samples' ''').fetchall()
+        if ('time_point_days',) not in columns:
+            raise ValueError(f'collected_samples of {schema} has no time_point_days, load the database again')
+
+        for name, (_, query) in COHORT_QUERIES.items():
+            connection.sql(f'PREPARE {self.statements[name]} AS {query.format(schema = schema)}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # the connection stays open
+
+        for statement in self.statements.values():
+            self.connection.sql(f'DEALLOCATE {statement}')
+        self.statements = {}
+
+    def execute(self, name: str, **params):
+
+        if not self.statements:
+            raise ValueError('the cohort queries are closed')
+        names, _ = COHORT_QUERIES[name]
+        values = ', '.join(f'{param} := {sql_literal(params[param])}' for param in names)
+        return self.connection.sql(f'EXECUTE {self.statements[name]}({values})').to_arrow_table()
+
+    def time_point_days(self, time_point: str):
+
+        if time_point not in self.days:
+            raise ValueError(f'unknown time point {time_point}, known are {", ".join(self.days)}')
+        return self.days[time_point]
+
+    def family_samples(self, family: str, time_point: str = None):
+
+        if time_point is None:
+            return self.execute('family_samples', family = family)
+        return self.execute('time_point_samples', family = family, days = self.time_point_days(time_point))
+
+    def antibiotic_free(self, first: str, last: str, members: list = None):
+        # first and last time point of the window, members: letters of the member table (e.g. ['B', 'C'] for the babies), all by default
+
+        return self.execute('antibiotic_free', first_days = self.time_point_days(first), last_days = self.time_point_days(last), members = members)
+
+    def feeding_groups(self, time_point: str):
+        return self.execute('feeding_groups', days = self.time_point_days(time_point))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Sharded processing of several recruitment sites, one worker process and one shard file per site workbook, merged into the main database
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import LazyModule
+from execute_metadata_processing import run_pipeline, load_database
+from family_database import load_connection, create_replace_baby_sheet_tables, create_replace_general_sheet_tables, unpivot_members
+from duplicate_rules import check_duplicated_samples
+from longitudinal_tables import create_replace_timelines
+from snapshot_loading import new_run_id, staging, publish_snapshot, registry_exists
+from parquet_output import read_parquet
+from pipeline_instrumentation import RunLog
+
+pd = LazyModule('pandas')
+
+SHARD_DIR = '.cohort_shards'
+
+# parents before their children, the conversions are the same csv files in every shard and taken from the first one
+MERGE_TABLES = ['collected_samples', 'antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health',
+                'families', 'diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details']
+SHARED_TABLES = ['time_conversions', 'member_conversions']
+
+def load_manifest(path: str):
+    # site;workbook;first;last;skips, skips separated by spaces, workbooks relative to the manifest
+    # the B### ranges of the sites must not overlap, checked before anything is extracted
+
+    manifest = pd.read_csv(path, sep = ';', dtype = str, encoding = 'utf-8-sig', keep_default_na = False)
+    if manifest['site'].duplicated().any():
+        raise ValueError(f'sites listed twice in {path}: {sorted(set(manifest.loc[manifest["site"].duplicated(), "site"]))}')
+
+    shards = []
+    for row in manifest.itertuples(index = False):
+        workbook = row.workbook if os.path.isabs(row.workbook) else os.path.join(os.path.dirname(path), row.workbook)
+        skips = [int(skip) for skip in row.skips.split()]
+        shards.append({'site': row.site, 'workbook': workbook, 'first': int(row.first), 'last': int(row.last), 'skips': skips})
+
+    taken = {}
+    for shard in shards:
+        for i in range(shard['first'], shard['last'] + 1):
+            if i not in shard['skips'] and taken.setdefault(i, shard['site']) != shard['site']:
+                raise ValueError(f'B{i:03} is in the ranges of {taken[i]} and {shard["site"]}')
+
+    return shards
+
+def shard_path(shard_dir: str, site: str, file_format: str):
+    return os.path.join(shard_dir, f'{site}.duckdb') if file_format == 'duckdb' else os.path.join(shard_dir, f'{site}_')
+
+def process_shard(shard: dict, shard_dir: str, file_format: str = 'duckdb'):
+    # one worker process, the whole pipeline of one site into its own shard file (duckdb) or dated parquet files
+
+    path = shard_path(shard_dir, shard['site'], file_format)
+    log = RunLog(trace_memory = False)
+    if file_format == 'duckdb':
+        if os.path.exists(path): # a shard is always rebuilt, a former snapshot registry would otherwise stay
+            os.remove(path)
+        run_pipeline(shard['workbook'], shard['first'], shard['last'], shard['skips'], database = path, log = log)
+    else:
+        run_pipeline(shard['workbook'], shard['first'], shard['last'], shard['skips'], output = path, file_format = 'parquet', log = log)
+        path = {'babies': sorted(glob.glob(f'{path}*_baby_sheets.parquet'))[-1], 'general': sorted(glob.glob(f'{path}*_general_sheet.parquet'))[-1]}
+
+    return {'site': shard['site'], 'path': path, 'seconds': log.report()['total_seconds'], 'stages': log.stages}
+
+def run_shards(shards: list, shard_dir: str = SHARD_DIR, file_format: str = 'duckdb', workers: int = None):
+    # wall time of the largest site as long as there are enough cores for all sites
+
+    os.makedirs(shard_dir, exist_ok = True)
+    workers = min(len(shards), workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        results = executor.map(process_shard, shards, [shard_dir] * len(shards), [file_format] * len(shards))
+        return list(results)
+
+def key_conflicts(connection, aliases: dict):
+    # sample_ids and families found in more than one shard, alias -> site
+
+    sample_ids = ' UNION ALL '.join(f'SELECT sample_id AS key, ? AS site FROM {alias}.collected_samples' for alias in aliases)
+    families = ' UNION ALL '.join(f'SELECT id AS key, ? AS site FROM {alias}.families UNION ALL SELECT family, ? FROM {alias}.collected_samples'
+                                  for alias in aliases)
+    conflicts = {}
+    for name, union, params in [('sample_id', sample_ids, list(aliases.values())),
+                                ('family', families, [site for site in aliases.values() for _ in range(2)])]:
+        rows = connection.execute(f'''SELECT key, list(DISTINCT site ORDER BY site) FROM ({union}) WHERE key IS NOT NULL
+                                      GROUP BY key HAVING count(DISTINCT site) > 1 ORDER BY key''', params).fetchall()
+        conflicts[name] = dict(rows)
+
+    return conflicts
+
+def conflict_message(conflicts: dict):
+
+    found = [f'{name} {key} in {", ".join(sites)}' for name, keys in conflicts.items() for key, sites in list(keys.items())[:20]]
+    return f'{sum(len(keys) for keys in conflicts.values())} keys in more than one shard: ' + '; '.join(found)
+
+def merge_tables(connection, aliases: list):
+    # shard tables attached read only, inserted by name into freshly created tables of the current schema
+
+    connection.begin()
+    try:
+        create_replace_baby_sheet_tables(connection)
+        create_replace_general_sheet_tables(connection)
+        for table in MERGE_TABLES:
+            for alias in aliases:
+                connection.sql(f'INSERT INTO {table} BY NAME SELECT * FROM {alias}.{table}')
+        for table in SHARED_TABLES:
+            connection.sql(f'INSERT INTO {table} BY NAME SELECT * FROM {aliases[0]}.{table}')
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    create_replace_timelines(connection)
+
+def merge_duckdb_shards(paths: dict, connection, log: RunLog, snapshot: bool = False):
+    # paths: site -> shard file, nothing is written if a sample_id or family is in more than one shard
+
+    # main of a database loaded as snapshots only has views, the merge goes through a snapshot as well (see load_database)
+    snapshot = snapshot or registry_exists(connection)
+    aliases = {f'shard_{i}': site for i, site in enumerate(paths)}
+    for alias, site in aliases.items():
+        connection.execute(f"ATTACH '{paths[site]}' AS {alias} (READ_ONLY)")
+    try:
+        conflicts = log.run('key_conflicts', key_conflicts, connection, aliases)
+        if any(conflicts.values()):
+            raise ValueError(conflict_message(conflicts))
+        expected = {table: sum(connection.sql(f'SELECT count(*) FROM {alias}.{table}').fetchone()[0] for alias in aliases) for table in MERGE_TABLES}
+
+        if not snapshot:
+            log.run('merge_tables', merge_tables, connection, list(aliases))
+            return
+        log.run_id = new_run_id(connection)
+        with staging(connection, log.run_id):
+            log.run('merge_tables', merge_tables, connection, list(aliases))
+    finally:
+        for alias in aliases:
+            connection.sql(f'DETACH {alias}')
+    log.run('publish_snapshot', publish_snapshot, connection, log.run_id, expected)
+
+def merge_parquet_shards(paths: dict, connection, log: RunLog, snapshot: bool = False):
+    # the cleaned frames of the shards are concatenated and loaded like a single run
+
+    babies = pd.concat([read_parquet(path['babies']) for path in paths.values()], axis = 0, ignore_index = True)
+    general = pd.concat([read_parquet(path['general']) for path in paths.values()], axis = 0, ignore_index = True)
+    families = general.loc[general['family'].duplicated(keep = False), 'family']
+    if not families.empty:
+        raise ValueError(f'{families.nunique()} families in more than one shard: {", ".join(sorted(families.unique())[:20])}')
+
+    members = log.run('unpivot_members', unpivot_members, babies)
+    check_duplicated_samples(members)
+    load_database(members, general, connection, log, snapshot)
+
+def run_cohorts(manifest_path: str, database: str, shard_dir: str = SHARD_DIR, file_format: str = 'duckdb', workers: int = None, snapshot: bool = False):
+
+    start = time.perf_counter()
+    shards = load_manifest(manifest_path)
+    results = run_shards(shards, shard_dir, file_format, workers)
+    shard_seconds = time.perf_counter() - start
+
+    log = RunLog(trace_memory = False)
+    log.section = 'merge'
+    connection = load_connection(database)
+    try:
+        paths = {result['site']: result['path'] for result in results}
+        if file_format == 'duckdb':
+            merge_duckdb_shards(paths, connection, log, snapshot)
+        else:
+            merge_parquet_shards(paths, connection, log, snapshot)
+    finally:
+        connection.close()
+
+    return {'shards': results, 'shard_wall_seconds': round(shard_seconds, 4), 'merge': log.report(),
+            'wall_seconds': round(time.perf_counter() - start, 4)}
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'ETL of several site workbooks in parallel, merged into one database')
+    parser.add_argument('manifest', help = 'csv with site;workbook;first;last;skips')
+    parser.add_argument('--database', required = True, help = 'duckdb file the shards are merged into, tables are recreated')
+    parser.add_argument('--shard-dir', default = SHARD_DIR)
+    parser.add_argument('--format', choices = ['duckdb', 'parquet'], default = 'duckdb', help = 'file format of the shards')
+    parser.add_argument('--workers', type = int, help = 'worker processes, one per site by default (at most the number of cores)')
+    parser.add_argument('--snapshot', action = 'store_true', help = 'merge into a new snapshot schema and swap it in')
+    parser.add_argument('--run-log', help = 'path of the JSON run log, printed if not given')
+    args = parser.parse_args()
+
+    report = run_cohorts(args.manifest, args.database, args.shard_dir, args.format, args.workers, args.snapshot)
+
+    if args.run_log:
+        with open(args.run_log, 'w') as file:
+            json.dump(report, file, indent = 2)
+    else:
+        print(json.dumps(report, indent = 2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Rule file for duplicated/retaken samples of the babybiome baby sheets, all exclusions in one anti-join, and a duplicate sample_id check
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+from lazy_imports import LazyModule
+from mapping_registry import REGISTRY
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+DUPLICATE_RULES = 'duplicate_rules.csv'
+
+# condition -> mask over the values of the rule column, value is the text of the rule file
+CONDITIONS = {'notna': lambda values, value: values.notna(),
+              'isna': lambda values, value: values.isna(),
+              '==': lambda values, value: equal(*typed_values(values, value)),
+              '!=': lambda values, value: not_equal(*typed_values(values, value))}
+
+def load_duplicate_rules(path: str = DUPLICATE_RULES):
+    # baby;time_point;column;condition;value;reason, an empty time_point matches every time point, an empty column the whole time point
+
+    rules = pd.DataFrame(REGISTRY.rules(path))
+    unknown = set(rules['condition'].dropna()) - set(CONDITIONS)
+    if unknown:
+        raise ValueError(f'unknown conditions in {path}: {sorted(unknown)}')
+
+    return rules
+
+def typed_values(values: pd.Series, value: str):
+    # a numeric rule value compares numbers, also if a stray text cell made the column object, such cells are NA and match neither == nor !=
+
+    number = pd.to_numeric(value, errors = 'coerce')
+    if pd.isna(number):
+        return values, value
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values.astype(object), errors = 'coerce')
+
+    return values.astype('Float64'), number
+
+def equal(values: pd.Series, value):
+    return (values == value).fillna(False)
+
+def not_equal(values: pd.Series, value):
+    return (values != value).fillna(False)
+
+def rule_hits(df: pd.DataFrame, rules: pd.DataFrame):
+    # (row position, rule) pairs of the rows whose key matches a rule
+
+    keys = pd.DataFrame({'baby': df['baby'].astype(object), 'time_point': df['time_point'].astype(object), 'row': np.arange(len(df))})
+    rule_cols = ['column', 'condition', 'value']
+
+    per_time_point = keys.merge(rules.loc[rules['time_point'].notna(), ['baby', 'time_point'] + rule_cols], on = ['baby', 'time_point'])
+    all_time_points = keys.merge(rules.loc[rules['time_point'].isna(), ['baby'] + rule_cols], on = 'baby')
+
+    return pd.concat([per_time_point, all_time_points], axis = 0, ignore_index = True)
+
+def excluded_rows(df: pd.DataFrame, rules: pd.DataFrame):
+    # the predicates are only evaluated on the rows of their rule
+
+    hits = rule_hits(df, rules)
+    matched = hits['column'].isna().to_numpy()
+
+    for (column, condition, value), group in hits[hits['column'].notna()].groupby(['column', 'condition', 'value'], dropna = False, sort = False):
+        if column not in df.columns: # a rule for a question that is not in the sheets
+            continue
+        values = df[column].iloc[group['row'].to_numpy()].reset_index(drop = True)
+        matched[group.index] = CONDITIONS[condition](values, value).to_numpy(dtype = bool)
+
+    return np.unique(hits.loc[matched, 'row'].to_numpy())
+
+def apply_duplicate_rules(df: pd.DataFrame, rules: pd.DataFrame):
+    # anti-join, rows and index of the kept rows stay as they are
+
+    keep = np.ones(len(df), dtype = bool)
+    keep[excluded_rows(df, rules)] = False
+
+    return df[keep]
+
+def duplicated_samples(long: pd.DataFrame):
+    # sample_ids occuring more than once, found with one hash group-by
+
+    counts = long.groupby('sample_id', sort = False).size()
+    return counts[counts > 1]
+
+def check_duplicated_samples(long: pd.DataFrame):
+    # before the insert, a duplicate would otherwise fail the collected_samples primary key halfway through the load
+
+    duplicates = duplicated_samples(long)
+    if not duplicates.empty:
+        raise ValueError(f'{len(duplicates)} duplicated sample_ids, add rules to {DUPLICATE_RULES}: {", ".join(duplicates.index[:20])}')
@@ -4,3 +4,351 @@
 ''' Execution of the ETL of the babybiome family metadata.
     @Author: 
     @Date: '''
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+
+from lazy_imports import LazyModule
+from babysheet_extract_transform import run_through_babies, clean_and_edit_baby, save_baby_sheets
+from general_sheet_extract_transform import prepare_general, clean_and_edit_general, save_general_sheet
+from family_database import (load_connection, create_replace_baby_sheet_tables, unpivot_members, insert_members, load_general_sheet,
+                             refresh_general_families)
+from streaming_etl import run_streaming
+from incremental_etl import run_incremental
+from longitudinal_tables import TIMELINES, create_replace_timelines
+from snapshot_loading import new_run_id, staging, expected_counts, publish_snapshot, prune_snapshots, registry_exists
+from workbook_session import WorkbookSession, GENERAL_SHEET
+from mapping_registry import file_hash
+from typed_schema import TIME_CONVERSIONS, MEMBER_CONVERSIONS
+from load_validation import validate_load, report_errors, format_report, check_load
+from pipeline_instrumentation import RunLog
+
+pd = LazyModule('pandas')
+
+BABY_RENAMING = 'baby_sheet_renaming.xlsx'
+BABY_DELETING = 'baby_sheet_deleting.xlsx'
+GENERAL_RENAMING = 'general_renaming.xlsx'
+GENERAL_DELETING = 'general_deleting.xlsx'
+MAPPINGS = [BABY_RENAMING, BABY_DELETING, GENERAL_RENAMING, GENERAL_DELETING, TIME_CONVERSIONS, MEMBER_CONVERSIONS]
+
+WATCH_INTERVAL = 1.0 # seconds between two looks at the files
+WATCH_DEBOUNCE = 5.0 # seconds without a further save before refreshing, excel saves in several writes
+
+def load_baby_tables(df, connection):
+    # recreates the baby sheet tables and fills them in one transaction
+
+    connection.begin()
+    try:
+        create_replace_baby_sheet_tables(connection)
+        insert_members(df, connection)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+def load_database(members, general, connection, log: RunLog, snapshot: bool = False, keep_snapshots: int = None, stream = None):
+    # members: unpivoted baby sheets, or stream: callable that streams the baby sheets into the connection
+    # snapshot: loaded into a staging schema, validated and swapped in, the run id is kept in the run log (always for a database with snapshots)
+
+    def load():
+        if stream is not None:
+            log.run('run_streaming', stream, connection)
+        else:
+            log.run('load_baby_tables', load_baby_tables, members, connection)
+        log.run('load_general_sheet', load_general_sheet, general, connection)
+        log.run('create_replace_timelines', create_replace_timelines, connection)
+
+    # once loaded as snapshots main only has views of the published snapshot, every later load goes through a snapshot as well
+    if not snapshot and not registry_exists(connection):
+        load()
+        return
+
+    log.run_id = new_run_id(connection)
+    with staging(connection, log.run_id):
+        load()
+    log.run('publish_snapshot', publish_snapshot, connection, log.run_id, expected_counts(members, general) if members is not None else None)
+    if keep_snapshots is not None:
+        prune_snapshots(connection, keep_snapshots)
+
+def stream_pipeline(path: str, first: int, last: int, skips: list, batch_size: int, database: str = None, output: str = None,
+                    file_format: str = 'parquet', log: RunLog = None, snapshot: bool = False, keep_snapshots: int = None,
+                    partition_cols: list = None):
+    # baby sheets batch by batch straight into the database and/or a parquet dataset, the general sheet as in run_pipeline
+
+    if output is not None and file_format != 'parquet':
+        raise ValueError('streaming writes a parquet dataset, use --format parquet')
+
+    log = log or RunLog()
+    today = date.today().strftime('%Y%m%d')
+    parquet_path = f'{output}{today}_baby_sheets' if output is not None else None
+
+    with WorkbookSession(path) as session: # one open workbook for the general sheet and all baby sheets
+        log.section = 'general'
+        general = log.run('prepare_general', prepare_general, path, GENERAL_RENAMING, GENERAL_DELETING, session)
+        general = clean_and_edit_general(general, log)
+
+        if output is not None:
+            log.section = 'output'
+            log.run('save_general_sheet', save_general_sheet, general, output, file_format)
+
+        def stream(connection):
+            return run_streaming(first, last, skips, path, BABY_RENAMING, BABY_DELETING, connection, parquet_path, partition_cols, batch_size,
+                                 session = session)
+
+        log.section = 'baby'
+        if database is None:
+            log.run('run_streaming', stream, None)
+        else:
+            connection = load_connection(database)
+            load_database(None, general, connection, log, snapshot, keep_snapshots, stream)
+            connection.close()
+
+    return None, general, log
+
+def extract_clean(path: str, first: int, last: int, skips: list, workers: int, log: RunLog):
+    # workbook -> cleaned baby and general frames, one open workbook (shared strings parsed once) for all B### sheets and the general sheet
+
+    with WorkbookSession(path) as session:
+        log.section = 'baby'
+        babies = log.run('run_through_babies', run_through_babies, first, last, skips, path, BABY_RENAMING, BABY_DELETING, workers = workers,
+                         session = session)
+        babies = clean_and_edit_baby(babies, log)
+
+        log.section = 'general'
+        general = log.run('prepare_general', prepare_general, path, GENERAL_RENAMING, GENERAL_DELETING, session)
+        general = clean_and_edit_general(general, log)
+
+    return babies, general
+
+def run_pipeline(path: str, first: int, last: int, skips: list, database: str = None, output: str = None, file_format: str = 'csv',
+                 workers: int = 1, log: RunLog = None, batch_size: int = None, snapshot: bool = False, keep_snapshots: int = None,
+                 partition_cols: list = None):
+    # workbook -> cleaned baby and general frames -> optional files and database, every stage is recorded in the run log
+    # batch_size: streaming mode, the baby frame is never built as a whole and None is returned for it
+    # partition_cols: parquet output only, the baby sheets as a hive partitioned dataset (e.g. ['baby'] or ['time_point'])
+
+    if batch_size is not None:
+        return stream_pipeline(path, first, last, skips, batch_size, database, output, file_format, log, snapshot, keep_snapshots,
+                               partition_cols)
+
+    log = log or RunLog()
+    babies, general = extract_clean(path, first, last, skips, workers, log)
+
+    if output is not None:
+        log.section = 'output'
+        log.run('save_baby_sheets', save_baby_sheets, babies, output, file_format, partition_cols)
+        log.run('save_general_sheet', save_general_sheet, general, output, file_format)
+
+    if database is not None:
+        log.section = 'database'
+        members = log.run('unpivot_members', unpivot_members, babies)
+        log.validation = log.run('check_load', check_load, members, general) # before the database is even opened
+        connection = load_connection(database)
+        load_database(members, general, connection, log, snapshot, keep_snapshots)
+        connection.close()
+
+    return babies, general, log
+
+def validate_pipeline(path: str, first: int, last: int, skips: list, workers: int = 1, log: RunLog = None):
+    # the violations a database load of the workbook would run into, nothing is written
+
+    log = log or RunLog()
+    babies, general = extract_clean(path, first, last, skips, workers, log)
+
+    log.section = 'validation'
+    members = log.run('unpivot_members', unpivot_members, babies)
+    report = log.run('validate_load', validate_load, members, general)
+
+    return report, log
+
+def file_stamps(paths: list):
+    # mtime and size, None while a file is replaced by the saving program
+
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamps[path] = None
+
+    return stamps
+
+def wait_for_quiet(paths: list, stamps: dict, interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE):
+    # stamps once none of the files changed for debounce seconds
+
+    quiet_since = time.monotonic()
+    while time.monotonic() - quiet_since < debounce:
+        time.sleep(interval)
+        current = file_stamps(paths)
+        if current != stamps:
+            stamps = current
+            quiet_since = time.monotonic()
+
+    return stamps
+
+def general_row_hashes(general: pd.DataFrame):
+    # one hash per family, a family is a column of the general sheet
+
+    values = general.drop('family', axis = 1).astype(str)
+    return dict(zip(general['family'], pd.util.hash_pandas_object(values, index = False)))
+
+def timelines_exist(connection):
+
+    tables = {row[0] for row in connection.sql("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall()}
+    return set(TIMELINES) <= tables
+
+class WorkbookWatcher:
+    # refreshes the tables of main after every save, baby sheets by their fingerprints (run_incremental), the general sheet per family
+    # the mapping hashes and general sheet hashes are only kept in memory, the first refresh reloads the general sheet
+
+    def __init__(self, path: str, first: int, last: int, skips: list, database: str):
+        self.path = path
+        self.first = first
+        self.last = last
+        self.skips = skips
+        self.database = database
+        self.mapping_hashes = None
+        self.general_fingerprint = None
+        self.general_hashes = None
+
+    def refresh_general(self, connection, log: RunLog, full: bool):
+        # families whose column changed, was added or removed, all families after a full rebuild
+
+        with WorkbookSession(self.path) as session:
+            fingerprint = session.fingerprints([GENERAL_SHEET])[GENERAL_SHEET]
+            if not full and fingerprint == self.general_fingerprint:
+                return []
+            general = log.run('prepare_general', prepare_general, self.path, GENERAL_RENAMING, GENERAL_DELETING, session)
+        general = clean_and_edit_general(general)
+        hashes = general_row_hashes(general)
+
+        if full or self.general_hashes is None:
+            log.run('load_general_sheet', load_general_sheet, general, connection)
+            families = sorted(hashes)
+        else:
+            families = sorted(family for family in hashes.keys() | self.general_hashes.keys()
+                              if hashes.get(family) != self.general_hashes.get(family))
+            if families:
+                log.run('refresh_general_families', refresh_general_families, general, families, connection)
+
+        self.general_fingerprint, self.general_hashes = fingerprint, hashes
+        return families
+
+    def refresh(self, full: bool = False):
+        # a changed mapping file rebuilds everything, the timelines only read the baby sheet tables and are refreshed after them (in run_incremental)
+
+        log = RunLog(trace_memory = False)
+        mapping_hashes = {path: file_hash(path) for path in MAPPINGS}
+        full = full or (self.mapping_hashes is not None and mapping_hashes != self.mapping_hashes)
+
+        connection = load_connection(self.database) # not kept open, readers of the database need the file lock in between
+        try:
+            if registry_exists(connection):
+                raise ValueError(f'{self.database} is loaded as snapshots, watch mode refreshes the tables of main')
+            families = self.refresh_general(connection, log, full)
+            _, changed, removed = log.run('run_incremental', run_incremental, self.first, self.last, self.skips, self.path, BABY_RENAMING, BABY_DELETING,
+                                          connection, full = full)
+            if not timelines_exist(connection): # database of a run before the timelines
+                log.run('create_replace_timelines', create_replace_timelines, connection)
+        finally:
+            connection.close()
+
+        self.mapping_hashes = mapping_hashes
+        return {'full': full, 'changed_sheets': changed, 'removed_sheets': removed, 'general_families': families, 'stages': log.stages}
+
+    def watch(self, interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE, report = print):
+        # report: called with the JSON line of every refresh, latency is from the last save to the refreshed database
+
+        paths = [self.path] + MAPPINGS
+        stamps = file_stamps(paths)
+        self.run_refresh(paths, stamps, [], report)
+
+        while True:
+            time.sleep(interval)
+            current = file_stamps(paths)
+            if current == stamps:
+                continue
+            current = wait_for_quiet(paths, current, interval, debounce)
+            trigger = [path for path in paths if current[path] != stamps[path]]
+            stamps = current
+            self.run_refresh(paths, stamps, trigger, report)
+
+    def run_refresh(self, paths: list, stamps: dict, trigger: list, report):
+        # a failing refresh (e.g. a workbook saved halfway) is reported, the next save triggers it again
+
+        start = time.perf_counter()
+        try:
+            result = self.refresh()
+        except Exception as error:
+            result = {'error': f'{type(error).__name__}: {error}'}
+        saved = max((stamps[path][0] for path in trigger if stamps[path] is not None), default = None)
+        latency = round(time.time() - saved / 1e9, 4) if saved is not None else None # None for the first refresh
+
+        report(json.dumps({'refreshed': datetime.now().isoformat(timespec = 'seconds'), 'trigger': trigger,
+                           'refresh_seconds': round(time.perf_counter() - start, 4), 'latency_seconds': latency, **result}))
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'ETL of the babybiome family metadata')
+    parser.add_argument('workbook')
+    parser.add_argument('--first', type = int, default = 1)
+    parser.add_argument('--last', type = int, required = True)
+    parser.add_argument('--skips', type = int, nargs = '*', default = [])
+    parser.add_argument('--database', help = 'duckdb file, tables are recreated')
+    parser.add_argument('--snapshot', action = 'store_true', help = 'load into a new snapshot schema and swap it in, previous snapshots stay queryable')
+    parser.add_argument('--keep-snapshots', type = int, help = 'number of published snapshots to keep')
+    parser.add_argument('--output', help = 'directory prefix for the dated baby/general sheet files')
+    parser.add_argument('--format', choices = ['csv', 'parquet'], default = 'csv')
+    parser.add_argument('--partition-by', nargs = '+', help = 'parquet output, columns of the baby sheet dataset partitions (e.g. baby time_point)')
+    parser.add_argument('--workers', type = int, default = 1)
+    parser.add_argument('--batch-size', type = int, help = 'streaming mode, babies per batch (parquet or database output only)')
+    parser.add_argument('--run-log', help = 'path of the JSON run log, printed if not given')
+    parser.add_argument('--profile-dir', help = 'one profile dump per stage')
+    parser.add_argument('--profiler', choices = ['cprofile', 'pyinstrument'], default = 'cprofile')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'skip the tracemalloc peaks (faster)')
+    parser.add_argument('--watch', action = 'store_true', help = 'keep running and refresh the database after every save of the workbook or a mapping file')
+    parser.add_argument('--interval', type = float, default = WATCH_INTERVAL, help = 'watch mode, seconds between two looks at the files')
+    parser.add_argument('--debounce', type = float, default = WATCH_DEBOUNCE, help = 'watch mode, seconds without a further save before refreshing')
+    parser.add_argument('--validate-only', action = 'store_true', help = 'report all violations of the database schema and exit (1 if there are errors)')
+    args = parser.parse_args()
+    if args.partition_by and (args.output is None or args.format != 'parquet'):
+        parser.error('--partition-by needs --output and --format parquet')
+
+    if args.validate_only:
+        if args.watch or args.batch_size is not None:
+            parser.error('--validate-only checks the whole workbook at once (no --watch or --batch-size)')
+        report, log = validate_pipeline(args.workbook, args.first, args.last, args.skips, args.workers,
+                                        RunLog(args.profile_dir, args.profiler, not args.no_memory))
+        print(format_report(report))
+        if args.run_log:
+            log.write(args.run_log)
+        sys.exit(1 if not report_errors(report).empty else 0)
+
+    if args.watch:
+        if args.database is None or args.snapshot or args.batch_size is not None:
+            parser.error('--watch needs --database and refreshes its tables in place (no --snapshot or --batch-size)')
+        watcher = WorkbookWatcher(args.workbook, args.first, args.last, args.skips, args.database)
+        try:
+            watcher.watch(args.interval, args.debounce, lambda line: print(line, flush = True))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    log = RunLog(args.profile_dir, args.profiler, not args.no_memory)
+    run_pipeline(args.workbook, args.first, args.last, args.skips, args.database, args.output, args.format, args.workers, log, args.batch_size,
+                 args.snapshot, args.keep_snapshots, args.partition_by)
+
+    if args.run_log:
+        log.write(args.run_log)
+    else:
+        print(json.dumps(log.report(), indent = 2))
+
+if __name__ == '__main__':
+    main()
@@ -5,88 +5,85 @@
     @Author: 
     @Date: '''
 
-import pandas as pd
-import duckdb
+from __future__ import annotations
+
+from lazy_imports import LazyModule
+from mapping_registry import REGISTRY
+from parquet_output import to_arrow
+from typed_schema import MEMBER_CONVERSIONS, TIME_CONVERSIONS, time_point_categories, time_point_days, member_categories, enum_values
+from text_classifier import SMOKING
+from duplicate_rules import check_duplicated_samples
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+duckdb = LazyModule('duckdb')
+
+# long column -> wide column of a member, {member} is the spelled member of the member table
+MEMBER_FIELDS = {'sampling_date': 'probe_date_{member}',
+                 'travel_time': 'travel_time_{member}',
+                 'bowel_movements': 'bowels_{member}',
+                 'antibiotics_taken': 'antibiotics_{member}',
+                 'antibiotics_notes': 'antibiotics_{member}_notes',
+                 'probiotics_taken': 'probiotics_{member}',
+                 'pacifier': 'pacifier_{member}',
+                 'weight': 'weight_{member}',
+                 'height': 'height_{member}',
+                 'illness': 'illness_{member}'}
+
+# columns that are the same for all members of a time point (twins share the feeding, see edit_baby_feeding_mode)
+SHARED_FIELDS = ['baby', 'time_point', 'probe_date_mpi', 'kit_oral', 'kit_faecal', 'probe_abnormalities_notes', 'probiotics_notes',
+                 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt', 'solids_baby1', 'formula_baby1', 'breastfed_baby1',
+                 'special_diet_baby', 'special_diet_baby_notes', 'u_untersuchung_abnormalities_notes', 'hospital_baby1_notes', 'feeding_mode',
+                 'diabetes_mother', 'diabetes_treatment_opt']
+
+ALWAYS_SAMPLED = ['mother'] # every time point has a mother row, the others only if they have sample information
+BABIES = ['baby1', 'baby2']
+MOTHERS = ['mother']
+
+# table -> (spelled members of its rows, None for all members, long columns in the order of the table columns)
+MEMBER_TABLES = {'collected_samples': (None, ['sample_id', 'baby', 'time_point', 'time_point_days', 'member', 'sampling_date', 'probe_date_mpi',
+                                              'travel_time', 'kit_oral', 'kit_faecal', 'bowel_movements', 'probe_abnormalities_notes']),
+                 'antibiotics': (None, ['sample_id', 'antibiotics_taken', 'antibiotics_notes']),
+                 'probiotics': (None, ['sample_id', 'probiotics_taken', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt', 'probiotics_notes']),
+                 'baby_diet': (BABIES, ['sample_id', 'solids_baby1', 'formula_baby1', 'breastfed_baby1', 'special_diet_baby', 'pacifier',
+                                        'special_diet_baby_notes']),
+                 'baby_health': (BABIES, ['sample_id', 'weight', 'height', 'illness', 'u_untersuchung_abnormalities_notes', 'hospital_baby1_notes']),
+                 'mother_health': (MOTHERS, ['sample_id', 'weight', 'diabetes_mother', 'diabetes_treatment_opt'])}
 
 def load_connection(path: str):
     return duckdb.connect(path)
 
-def separate_father(df: pd.DataFrame):
-    # preparation for transforming into the database
+def current_schema(connection):
+    return connection.sql('SELECT current_schema()').fetchone()[0]
 
-    father = df[['baby', 'time_point', 'probe_date_father', 'probe_date_mpi', 'travel_time_father', 'kit_oral', 'kit_faecal', 'bowels_father', 'probe_abnormalities_notes', 'antibiotics_father', 'antibiotics_father_notes', 'probiotics_father', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt']].copy()
-    father = father[~((father['antibiotics_father'].isna())&(father['probe_date_father'].isna())&(father['bowels_father'].isna()))] # removes rows with no father samples
-    father['sample_id'] = father['baby'] + '-' + 'F' + '-' + father['time_point']
-    father['member'] = 'F'
-
-    return father
-
-def separate_mother(df: pd.DataFrame):
-    # preparation for transforming into database
-
-    mother = df[['baby', 'time_point', 'probe_date_mother', 'probe_date_mpi', 'travel_time_mother', 'kit_oral', 'kit_faecal', 'bowels_mother', 'probe_abnormalities_notes', 'antibiotics_mother', 'antibiotics_mother_notes', 'probiotics_mother', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt', 'weight_mother', 'diabetes_mother', 'diabetes_treatment_opt']].copy()
-    mother['sample_id'] = mother['baby'] + '-' + 'M' + '-' + mother['time_point']
-    mother['member'] = 'M'
-
-    return mother
-
-def separate_sib1(df: pd.DataFrame):
-    # preparation for transforming into database
-
-    sib1 = df[['baby', 'time_point', 'probe_date_sib1', 'probe_date_mpi', 'travel_time_sib1', 'kit_oral', 'kit_faecal', 'bowels_sib1', 'probe_abnormalities_notes', 'antibiotics_sib1', 'antibiotics_sib1_notes', 'probiotics_sib1', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt']].copy()
-    sib1 = sib1[~((sib1['antibiotics_sib1'].isna())&(sib1['probe_date_sib1'].isna())&(sib1['bowels_sib1'].isna()))]
-    sib1['sample_id'] = sib1['baby'] + '-' + 'S' + '-' + sib1['time_point']
-    sib1['member'] = 'S'
-
-    return sib1
-
-def separate_sib2(df: pd.DataFrame):
-    # preparation for transforming into database
-
-    sib2 = df[['baby', 'time_point', 'probe_date_sib2', 'probe_date_mpi', 'travel_time_sib2', 'kit_oral', 'kit_faecal', 'bowels_sib2', 'probe_abnormalities_notes', 'antibiotics_sib2', 'antibiotics_sib2_notes', 'probiotics_sib2', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt']].copy()
-    sib2 = sib2[~((sib2['antibiotics_sib2'].isna())&(sib2['probe_date_sib2'].isna())&(sib2['bowels_sib2'].isna()))]
-    sib2['sample_id'] = sib2['baby'] + '-' + 'T' + '-' + sib2['time_point']
-    sib2['member'] = 'T'
-
-    return sib2
-
-def separate_baby1(df: pd.DataFrame):
-    # preparation for transforming into database
-
-    baby1 = df[['baby', 'time_point', 'probe_date_baby1', 'probe_date_mpi', 'travel_time_baby1', 'kit_oral', 'kit_faecal', 'bowels_baby1', 'probe_abnormalities_notes', 'antibiotics_baby1', 'antibiotics_baby1_notes', 'probiotics_baby1', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt', 'weight_baby1', 'solids_baby1', 'breastfed_baby1', 'formula_baby1', 'special_diet_baby', 'pacifier_baby1', 'special_diet_baby_notes', 'height_baby1', 'illness_baby1', 'u_untersuchung_abnormalities_notes', 'hospital_baby1_notes', 'feeding_mode']].copy()
-    baby1 = baby1[~((baby1['antibiotics_baby1'].isna())&(baby1['probe_date_baby1'].isna())&(baby1['bowels_baby1'].isna()))]
-    baby1['sample_id'] = baby1['baby'] + '-' + 'B' + '-' + baby1['time_point']
-    baby1['member'] = 'B'
-
-    return baby1
-
-def separate_baby2(df: pd.DataFrame):
-
-    baby2 = df[['baby', 'time_point', 'probe_date_baby2', 'probe_date_mpi', 'travel_time_baby2', 'kit_oral', 'kit_faecal', 'bowels_baby2', 'probe_abnormalities_notes', 'antibiotics_baby2', 'antibiotics_baby2_notes', 'probiotics_baby2', 'probiotics_notes', 'probiotics_bifido', 'probiotics_e_coli', 'probiotics_lakt', 'weight_baby2', 'solids_baby1', 'breastfed_baby1', 'formula_baby1', 'special_diet_baby', 'pacifier_baby2', 'special_diet_baby_notes', 'height_baby2', 'illness_baby2', 'u_untersuchung_abnormalities_notes', 'hospital_baby1_notes', 'feeding_mode']].copy()
-    baby2 = baby2[~((baby2['antibiotics_baby2'].isna())&(baby2['probe_date_baby2'].isna())&(baby2['bowels_baby2'].isna()))]
-    baby2['sample_id'] = baby2['baby'] + '-' + 'C' + '-' + baby2['time_point']
-    baby2['member'] = 'C'
-
-    return baby2
-
-def create_replace_baby_sheet_tables(connection):
+def create_replace_baby_sheet_tables(connection, times_path: str = TIME_CONVERSIONS, members_path: str = MEMBER_CONVERSIONS):
     # schemas for the tables etc. can all also be found in corresponding file
 
-    connection.sql('''
-                    DROP TABLE IF EXISTS antibiotics;       
-                    DROP TABLE IF EXISTS probiotics;
-                    DROP TABLE IF EXISTS baby_diet;
-                    DROP TABLE IF EXISTS baby_health;
-                    DROP TABLE IF EXISTS mother_health;
-                    DROP TABLE IF EXISTS collected_samples;
+    schema = current_schema(connection) # qualified, an unqualified drop falls back to main when the table is not in the current schema
+    connection.sql(f'''
+                    DROP TABLE IF EXISTS {schema}.antibiotics;       
+                    DROP TABLE IF EXISTS {schema}.probiotics;
+                    DROP TABLE IF EXISTS {schema}.baby_diet;
+                    DROP TABLE IF EXISTS {schema}.baby_health;
+                    DROP TABLE IF EXISTS {schema}.mother_health;
+                    DROP TABLE IF EXISTS {schema}.collected_samples;
                    ''') # need to drop tables if we want to repopulate from scratch due to dependencies with foreign keys
 
+    # same categories as the categorical columns (typed_schema), time points in chronological order
+    connection.sql(f'''
+                    DROP TYPE IF EXISTS {schema}.time_point_enum;
+                    DROP TYPE IF EXISTS {schema}.member_enum;
+                    CREATE TYPE time_point_enum AS ENUM ({enum_values(time_point_categories(times_path))});
+                    CREATE TYPE member_enum AS ENUM ({enum_values(member_categories(members_path))});
+                   ''')
+
     connection.sql('''
                     CREATE TABLE "collected_samples" (
                     "sample_id" varchar PRIMARY KEY,
                     "family" varchar(4),
-                    "time_point" varchar,
-                    "member" varchar,
+                    "time_point" time_point_enum,
+                    "time_point_days" numeric,
+                    "member" member_enum,
                     "sampling_date" date,
                     "frozen_date" date,
                     "travel_time" int,
@@ -95,7 +92,8 @@ def create_replace_baby_sheet_tables(connection):
                     "bowel_movements" varchar,
                     "sampling_notes" text
                     );
-                   ''')
+                    CREATE INDEX collected_samples_family ON collected_samples (family);
+                   ''') # duckdb only uses the index for selective equality filters, one family out of hundreds
     
     connection.sql('''
                     CREATE TABLE "antibiotics" (
@@ -148,82 +146,311 @@ def create_replace_baby_sheet_tables(connection):
                     );
                    ''')
 
-def insert_father(df: pd.DataFrame, connection):
+def load_member_conversions(path: str = MEMBER_CONVERSIONS):
+    return pd.DataFrame(REGISTRY.conversions(path))
 
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_father, 
-                   probe_date_mpi, travel_time_father, kit_oral, kit_faecal, bowels_father, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_father, antibiotics_father_notes FROM df
+def sample_ids(long: pd.DataFrame):
+    # baby-member-time_point, the strings are only joined once per distinct key
+
+    if long.empty: # no levels to factorize, e.g. a run that only removes sheets
+        return np.array([], dtype = object)
+    codes, keys = pd.MultiIndex.from_frame(long[['baby', 'member', 'time_point']]).factorize()
+    ids = np.array(['-'.join(map(str, key)) for key in keys] + [None], dtype = object)
+
+    return ids[codes]
+
+def unpivot_members(df: pd.DataFrame, members_path: str = MEMBER_CONVERSIONS, times_path: str = TIME_CONVERSIONS):
+    # wide baby sheet frame -> one row per member and time point, members and their letters come from the member table
+
+    members = load_member_conversions(members_path).sort_values('number')
+
+    # members without e.g. a pacifier column get NA of the dtype the other members have, all NA columns would not count for the concat
+    wide_cols = {field: [template.format(member = spelled) for spelled in members['spelled']] for field, template in MEMBER_FIELDS.items()}
+    dtypes = {field: next((df[col].dtype for col in wide if col in df.columns), object) for field, wide in wide_cols.items()}
+
+    frames = []
+    for letter, spelled in zip(members['one_letter'], members['spelled']):
+        wide = [template.format(member = spelled) for template in MEMBER_FIELDS.values()]
+        member = df.reindex(columns = SHARED_FIELDS + wide)
+        member.columns = SHARED_FIELDS + list(MEMBER_FIELDS)
+        member = member.astype({field: dtypes[field] for field, col in zip(MEMBER_FIELDS, wide) if col not in df.columns})
+        member.insert(0, 'member', pd.Categorical([letter] * len(member), categories = members['one_letter']))
+        member.insert(0, 'spelled', pd.Categorical([spelled] * len(member), categories = members['spelled']))
+        frames.append(member)
+
+    long = pd.concat(frames, axis = 0, ignore_index = True)
+
+    sampled = long['spelled'].isin(ALWAYS_SAMPLED) | long[['antibiotics_taken', 'sampling_date', 'bowel_movements']].notna().any(axis = 1) # removes rows with no samples
+    long = long[sampled].reset_index(drop = True)
+    long.insert(0, 'sample_id', sample_ids(long))
+    days = long['time_point'].astype(object).map(time_point_days(times_path))
+    long.insert(long.columns.get_loc('time_point') + 1, 'time_point_days', pd.array(days, dtype = 'Float64'))
+
+    return long
+
+def member_table_rows(long: pd.DataFrame, members: list):
+    return long if members is None else long[long['spelled'].isin(members)]
+
+def insert_members(long: pd.DataFrame, connection):
+    # one bulk insert per table
+
+    check_duplicated_samples(long)
+
+    for table, (members, cols) in MEMBER_TABLES.items():
+        rows = member_table_rows(long, members)
+        connection.sql(f'INSERT INTO {table} SELECT {", ".join(cols)} FROM rows')
+
+def create_fingerprint_table(connection):
+    # content hashes of the baby sheets that are currently loaded, used for incremental runs
+
+    connection.sql('''
+                    CREATE TABLE IF NOT EXISTS "sheet_fingerprints" (
+                    "sheet" varchar PRIMARY KEY,
+                    "fingerprint" varchar,
+                    "processed" timestamp
+                    );
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_father, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
-    
-def insert_mother(df: pd.DataFrame, connection):
-    
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_mother, 
-                   probe_date_mpi, travel_time_mother, kit_oral, kit_faecal, bowels_mother, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_mother, antibiotics_mother_notes FROM df
+
+def load_fingerprints(connection):
+
+    create_fingerprint_table(connection)
+    return dict(connection.sql('SELECT sheet, fingerprint FROM sheet_fingerprints').fetchall())
+
+def forget_fingerprints(sheets: list, connection):
+    connection.execute('DELETE FROM sheet_fingerprints WHERE sheet IN (SELECT unnest(?))', [sheets])
+
+def save_fingerprints(fingerprints: dict, removed: list, connection):
+
+    sheets = list(fingerprints) + list(removed)
+    forget_fingerprints(sheets, connection)
+    if fingerprints: # executemany does not take an empty list
+        connection.executemany('INSERT INTO sheet_fingerprints VALUES (?, ?, current_timestamp)', list(fingerprints.items()))
+
+def baby_sheet_tables_exist(connection):
+
+    # only the tables of main, snapshot schemas (snapshot_loading) have their own collected_samples
+    # tables of a database loaded before the numeric time point key count as missing, they are recreated
+    tables = connection.sql('''SELECT c.table_name FROM information_schema.tables t JOIN information_schema.columns c USING (table_catalog, table_schema, table_name)
+                               WHERE t.table_schema = 'main' AND t.table_name = 'collected_samples' AND t.table_type = 'BASE TABLE'
+                               AND c.column_name = 'time_point_days' ''').fetchall()
+    return len(tables) > 0
+
+def delete_sample_details(families: list, connection):
+    # the tables referencing collected_samples, committed before collected_samples is changed: duckdb checks the foreign keys eagerly
+    # and can not delete a parent row in the transaction that deleted its children
+
+    for table in ['antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health']:
+        connection.execute(f'''DELETE FROM {table} WHERE sample_id IN 
+                           (SELECT sample_id FROM collected_samples WHERE family IN (SELECT unnest(?)))''', [families])
+
+def delete_families(families: list, connection):
+    # collected_samples only, after delete_sample_details
+    connection.execute('DELETE FROM collected_samples WHERE family IN (SELECT unnest(?))', [families])
+
+def insert_baby_sheets(df: pd.DataFrame, connection, members_path: str = MEMBER_CONVERSIONS):
+    # without its own transaction, see run_incremental
+    insert_members(unpivot_members(df, members_path), connection)
+
+def create_replace_general_sheet_tables(connection):
+    # schema.sql, with duckdb types (numeric for number) and without the foreign key of families on collected_samples (family is not unique there)
+
+    schema = current_schema(connection)
+    connection.sql(f'''
+                    DROP TABLE IF EXISTS {schema}.diabetes;
+                    DROP TABLE IF EXISTS {schema}.mother_details;
+                    DROP TABLE IF EXISTS {schema}.family_health;
+                    DROP TABLE IF EXISTS {schema}.household_details;
+                    DROP TABLE IF EXISTS {schema}.birth_details;
+                    DROP TABLE IF EXISTS {schema}.families;
+                    DROP TABLE IF EXISTS {schema}.time_conversions;
+                    DROP TABLE IF EXISTS {schema}.member_conversions;
+                    DROP TYPE IF EXISTS {schema}.smoking_enum;
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_mother, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
-    
-    connection.sql('''INSERT INTO mother_health SELECT sample_id, weight_mother, diabetes_mother, diabetes_treatment_opt FROM df''')
 
-def insert_sib1(df: pd.DataFrame, connection):
-    
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_sib1, 
-                   probe_date_mpi, travel_time_sib1, kit_oral, kit_faecal, bowels_sib1, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_sib1, antibiotics_sib1_notes FROM df
+    connection.sql(f'''CREATE TYPE smoking_enum AS ENUM ({enum_values(SMOKING.labels)});''') # labels of edit_smoking
+
+    connection.sql('''
+                    CREATE TABLE "time_conversions" (
+                    "categorical" varchar,
+                    "days" numeric,
+                    "months" numeric,
+                    "weeks" numeric,
+                    "abbreviated" varchar
+                    );
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_sib1, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
 
-def insert_sib2(df: pd.DataFrame, connection):
-    
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_sib2, 
-                   probe_date_mpi, travel_time_sib2, kit_oral, kit_faecal, bowels_sib2, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_sib2, antibiotics_sib2_notes FROM df
+    connection.sql('''
+                    CREATE TABLE "member_conversions" (
+                    "one_letter" char(1),
+                    "number" int,
+                    "spelled" varchar
+                    );
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_sib2, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
 
-def insert_baby1(df: pd.DataFrame, connection):
-    
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_baby1, 
-                   probe_date_mpi, travel_time_baby1, kit_oral, kit_faecal, bowels_baby1, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_baby1, antibiotics_baby1_notes FROM df
+    connection.sql('''
+                    CREATE TABLE "families" (
+                    "id" varchar(4) PRIMARY KEY,
+                    "father" bool,
+                    "siblings" integer,
+                    "study_participants" integer
+                    );
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_baby1, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
-    
-    connection.sql('''INSERT INTO baby_diet SELECT sample_id, solids_baby1, formula_baby1, breastfed_baby1, special_diet_baby, 
-                   pacifier_baby1, special_diet_baby_notes FROM df''')
-    
-    connection.sql('''INSERT INTO baby_health SELECT sample_id, weight_baby1, height_baby1, illness_baby1,
-                   u_untersuchung_abnormalities_notes, hospital_baby1_notes FROM df''')
 
-def insert_baby2(df: pd.DataFrame, connection):
-    
-    connection.sql('''INSERT INTO collected_samples SELECT sample_id, baby, time_point, member, probe_date_baby2, 
-                   probe_date_mpi, travel_time_baby2, kit_oral, kit_faecal, bowels_baby2, probe_abnormalities_notes FROM df''')
-    
-    connection.sql(''' INSERT INTO antibiotics SELECT sample_id, antibiotics_baby2, antibiotics_baby2_notes FROM df
+    connection.sql('''
+                    CREATE TABLE "diabetes" (
+                    "id" varchar(4) REFERENCES families(id),
+                    "present" bool,
+                    "oral_test" bool,
+                    "treatment" varchar,
+                    "diagnosis" date,
+                    "previous_pregnancy" bool
+                    );
                    ''')
-    
-    connection.sql('''INSERT INTO probiotics SELECT sample_id, probiotics_baby2, probiotics_bifido, probiotics_e_coli, 
-                   probiotics_lakt, probiotics_notes FROM df''')
-    
-    connection.sql('''INSERT INTO baby_diet SELECT sample_id, solids_baby1, formula_baby1, breastfed_baby1, special_diet_baby, 
-                   pacifier_baby2, special_diet_baby_notes FROM df''')
-    
-    connection.sql('''INSERT INTO baby_health SELECT sample_id, weight_baby2, height_baby2, illness_baby2, 
-                   u_untersuchung_abnormalities_notes, hospital_baby1_notes FROM df''')
\ No newline at end of file
+
+    connection.sql('''
+                    CREATE TABLE "mother_details" (
+                    "id" varchar(4) REFERENCES families(id),
+                    "age" integer,
+                    "weight_pre_pregnancy" numeric,
+                    "height" integer,
+                    "weight_pre_birth" numeric,
+                    "smoke" smoking_enum,
+                    "alcohol" bool,
+                    "medicine" varchar,
+                    "supplements" varchar,
+                    "antibiotics_past_6" varchar,
+                    "last_antibiotics" varchar
+                    );
+                   ''')
+
+    connection.sql('''
+                    CREATE TABLE "family_health" (
+                    "id" varchar(4) REFERENCES families(id),
+                    "father_smoke" smoking_enum,
+                    "sibling_disease" varchar,
+                    "lactose_int" bool,
+                    "celiac" bool,
+                    "antibiotics_past_6" varchar,
+                    "last_antibiotics" varchar,
+                    "family_disease" varchar,
+                    "family_diet" varchar
+                    );
+                   ''')
+
+    connection.sql('''
+                    CREATE TABLE "household_details" (
+                    "id" varchar(4) REFERENCES families(id),
+                    "members" integer,
+                    "nationality" varchar,
+                    "pets" varchar
+                    );
+                   ''')
+
+    connection.sql('''
+                    CREATE TABLE "birth_details" (
+                    "id" varchar(4) REFERENCES families(id),
+                    "due_date" date,
+                    "birth_date" date,
+                    "sampled" bool,
+                    "delivery" varchar,
+                    "location" varchar,
+                    "water_birth" bool,
+                    "gender" varchar,
+                    "birth_weight" numeric,
+                    "birth_height" numeric,
+                    "abnormalities" varchar,
+                    "complications" varchar,
+                    "antibiotics" bool,
+                    "prebiotics" bool,
+                    "apgra" varchar,
+                    "notes" text
+                    );
+                   ''')
+
+# table -> {table column: general sheet column}, table columns without a questionnaire field stay NULL
+GENERAL_TABLES = {'families': {'id': 'family', 'father': 'father_participation', 'siblings': 'sibling_number', 'study_participants': None},
+                  'diabetes': {'id': 'family', 'present': 'gestational_diabetes', 'oral_test': None, 'treatment': None, 'diagnosis': None,
+                               'previous_pregnancy': 'gestational_diabetes_previous'},
+                  'mother_details': {'id': 'family', 'age': 'age_mother', 'weight_pre_pregnancy': 'weight_mother_pre_pregnancy', 'height': 'height_mother',
+                                     'weight_pre_birth': 'weight_mother_pre_birth', 'smoke': 'smoking_mother', 'alcohol': 'alcohol_pregnancy',
+                                     'medicine': 'medication', 'supplements': 'diet_supplements', 'antibiotics_past_6': 'antibiotics_last_6M_mother',
+                                     'last_antibiotics': 'antibiotics_last_mother'},
+                  'family_health': {'id': 'family', 'father_smoke': 'smoking_father', 'sibling_disease': 'disease_siblings', 'lactose_int': 'lactose_intolerance',
+                                    'celiac': 'celiac_disease', 'antibiotics_past_6': 'antibiotics_last_6M_family', 'last_antibiotics': None,
+                                    'family_disease': 'disease_family', 'family_diet': 'special_diet_family'},
+                  'household_details': {'id': 'family', 'members': None, 'nationality': 'nationality', 'pets': 'pets'}}
+
+# birth details per baby, twins get a second row with the same family id
+BIRTH_FIELDS = {'id': 'family', 'due_date': 'birth_date_calculated', 'birth_date': 'birth_date', 'sampled': 'sampled_at_birth', 'delivery': 'birth_mode',
+                'location': 'birth_place', 'water_birth': 'water_birth', 'gender': 'gender_{baby}', 'birth_weight': 'weight_{baby}_at_birth',
+                'birth_height': 'height_{baby}_at_birth', 'abnormalities': 'abnormalities_U1_U2_{baby}', 'complications': 'birth_complications_{baby}',
+                'antibiotics': 'antibiotics_{baby}_at_birth', 'prebiotics': 'probiotics_{baby}_at_birth', 'apgra': 'APGRA_score_{baby}',
+                'notes': 'birth_notes_{baby}'}
+BIRTH_ALIASES = {'height_baby1_at_birth': 'geight_baby1_at_birth'} # spelling in general_renaming.xlsx
+
+def select_table(df: pd.DataFrame, fields: dict):
+
+    table = pd.DataFrame(index = df.index)
+    for col, source in fields.items():
+        table[col] = df[source] if source in df.columns else pd.Series(pd.NA, index = df.index, dtype = object)
+
+    return table.reset_index(drop = True)
+
+def birth_table(df: pd.DataFrame):
+
+    babies = []
+    for baby in BABIES:
+        fields = {col: source.format(baby = baby) for col, source in BIRTH_FIELDS.items()}
+        fields = {col: BIRTH_ALIASES.get(source, source) for col, source in fields.items()}
+        table = select_table(df, fields)
+        specific = [col for col, source in BIRTH_FIELDS.items() if '{baby}' in source]
+        babies.append(table if baby == BABIES[0] else table[table[specific].notna().any(axis = 1)])
+
+    return pd.concat(babies, axis = 0, ignore_index = True)
+
+def load_time_conversions(path: str = TIME_CONVERSIONS):
+    return pd.DataFrame(REGISTRY.conversions(path))
+
+def general_sheet_tables(df: pd.DataFrame, members_path: str = MEMBER_CONVERSIONS, times_path: str = TIME_CONVERSIONS):
+
+    tables = {table: select_table(df, fields) for table, fields in GENERAL_TABLES.items()}
+    tables['birth_details'] = birth_table(df)
+    tables['time_conversions'] = load_time_conversions(times_path)[['categorical', 'days', 'months', 'weeks', 'abbreviated']]
+    tables['member_conversions'] = load_member_conversions(members_path)[['one_letter', 'number', 'spelled']]
+
+    return tables
+
+def refresh_general_families(df: pd.DataFrame, families: list, connection, members_path: str = MEMBER_CONVERSIONS, times_path: str = TIME_CONVERSIONS):
+    # rows of the changed, added or removed families only, deletes committed on their own like in delete_families
+
+    tables = general_sheet_tables(df[df['family'].isin(families)], members_path, times_path)
+    for table in ['diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details', 'families']:
+        connection.execute(f'DELETE FROM {table} WHERE id IN (SELECT unnest(?))', [families])
+
+    connection.begin()
+    try:
+        for table in ['families', 'diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details']:
+            connection.register(f'{table}_arrow', to_arrow(tables[table]))
+            connection.sql(f'INSERT INTO {table} SELECT * FROM {table}_arrow')
+            connection.unregister(f'{table}_arrow')
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+def load_general_sheet(df: pd.DataFrame, connection, members_path: str = MEMBER_CONVERSIONS, times_path: str = TIME_CONVERSIONS):
+    # tables are recreated and filled from arrow tables registered with duckdb, all in one transaction
+
+    tables = general_sheet_tables(df, members_path, times_path)
+
+    connection.begin()
+    try:
+        create_replace_general_sheet_tables(connection)
+        for table in ['time_conversions', 'member_conversions', 'families', 'diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details']:
+            connection.register(f'{table}_arrow', to_arrow(tables[table]))
+            connection.sql(f'INSERT INTO {table} SELECT * FROM {table}_arrow')
+            connection.unregister(f'{table}_arrow')
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
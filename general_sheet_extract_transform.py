@@ -5,33 +5,20 @@
     @Author: LRB 
     @Date: 19.02.2025'''
 
-import pandas as pd
-from datetime import date
-import openpyxl
-
-from babysheet_extract_transform import merge_normal_notes, set_col_names, deleting_cols, diet_condition, col_type_changes
+from __future__ import annotations
 
-def load_general_sheet(path: str):
-    return pd.read_excel(path, sheet_name = 'Fragebogen-allgemein+Geburt', header = None)
+from datetime import date
 
-def load_general_sheet_notes(path: str):
-    workbook = openpyxl.load_workbook(path)
-    worksheet = workbook['Fragebogen-allgemein+Geburt']
-    normal = pd.DataFrame(worksheet.values) # for column labels
-    
-    for row in worksheet.iter_rows():
-        for cell in row:
-            cell_comment = cell.comment
-            if cell_comment:
-                cell.value = cell_comment.text
-            else:
-                cell.value = None
-    
-    notes = pd.DataFrame(worksheet.values)
-    notes.iloc[:, 1] = normal.iloc[:, 1] + "_notes" # adds column labels back
-    notes.iloc[0, 2:] = normal.iloc[0, 2:] # adds baby labels back
+from lazy_imports import LazyModule
+from sheet_transform import merge_normal_notes, set_col_names, deleting_cols, col_type_changes
+from workbook_session import WorkbookSession, GENERAL_SHEET
+from text_classifier import DIET, SMOKING
+from value_normalization import normalize_frame, GENERAL_VALUE_SPEC
+from typed_schema import apply_types, general_sheet_types
+from parquet_output import write_parquet
+from pipeline_instrumentation import run_step
 
-    return notes
+pd = LazyModule('pandas')
 
 def rough_clean_general(df: pd.DataFrame):
 
@@ -49,9 +36,20 @@ def add_baby_col(df: pd.DataFrame):
 
     return df
 
-def prepare_general(path: str, renaming: str, deleting: str):
-    
-    df = merge_normal_notes(load_general_sheet(path), load_general_sheet_notes(path))
+def read_general_sheet(session: WorkbookSession):
+
+    normal, notes = session.read_sheet(GENERAL_SHEET)
+    notes.iloc[0, 2:] = normal.iloc[0, 2:] # adds baby labels back
+
+    return normal, notes
+
+def prepare_general(path: str, renaming: str, deleting: str, session: WorkbookSession = None):
+
+    if session is None:
+        with WorkbookSession(path) as session:
+            return prepare_general(path, renaming, deleting, session)
+
+    df = merge_normal_notes(*read_general_sheet(session))
     df = rough_clean_general(df)
     df = set_col_names(df, renaming)
     df = deleting_cols(df, deleting)
@@ -59,46 +57,26 @@ def prepare_general(path: str, renaming: str, deleting: str):
 
     return df
 
-def smoking_conditional(row):
-
-    if 'nie' in row:
-        return 'never'
-    elif 'nein' in row:
-        return 'no'
-    elif 'ja' in row:
-        return 'yes'
-    elif 'früher' in row:
-        return 'previously'
-    else:
-        return pd.NA
-    
 def edit_smoking(df: pd.DataFrame):
     
     df['smoking_father_notes'] = df['smoking_father'].astype(str) + df['smoking_father_notes'].astype(str)
-    df['smoking_father'] = df['smoking_father_notes'].apply(smoking_conditional)
+    df['smoking_father'] = SMOKING.first_label(df['smoking_father_notes']) # never > no > yes > previously
 
     df['smoking_mother_notes'] = df['smoking_mother'].astype(str) + df['smoking_mother_notes'].astype(str)
-    df['smoking_mother'] = df['smoking_mother_notes'].apply(smoking_conditional)
+    df['smoking_mother'] = SMOKING.first_label(df['smoking_mother_notes'])
 
-    return df
+    return apply_types(df, general_sheet_types())
 
 def edit_family_diet(df: pd.DataFrame):
 
     # works under the assumption that diet with twins is equal!
     df['special_diet_family_notes'] = df['diet_family'].astype(str) + df['diet_family_notes'].astype(str)
-    df['special_diet_family'] = df['special_diet_family_notes'].apply(diet_condition)
+    df['special_diet_family'] = DIET.label_lists(df['special_diet_family_notes'])
 
     return df
 
 def replacing_values_general(df: pd.DataFrame):
-  
-    replace = ['[Jj][Aa]', '[Nn][Ee][Ii][Nn]']
-    val = ['True', 'False', 'min. once per day']
-    
-    for i in range(len(replace)):
-        df = df.replace(to_replace = replace[i], regex = True, value = val[i])
-
-    return df       
+    return normalize_frame(df, GENERAL_VALUE_SPEC) # only the yes/no columns, free text and notes are left alone
 
 def edit_birth_weight(df: pd.DataFrame):
 
@@ -107,17 +85,21 @@ def edit_birth_weight(df: pd.DataFrame):
     
     return df
 
-def clean_and_edit_general(df: pd.DataFrame):
+def clean_and_edit_general(df: pd.DataFrame, log = None):
+    # log: optional RunLog that times every step
 
-    df = edit_smoking(df)
-    df = edit_family_diet(df)
-    df = edit_birth_weight(df)
-    df = replacing_values_general(df)
-    df = col_type_changes(df)
+    df = run_step(log, edit_smoking, df)
+    df = run_step(log, edit_family_diet, df)
+    df = run_step(log, edit_birth_weight, df)
+    df = run_step(log, replacing_values_general, df)
+    df = run_step(log, col_type_changes, df)
 
     return df
 
-def save_general_sheet(df: pd.DataFrame, path: str):
+def save_general_sheet(df: pd.DataFrame, path: str, file_format: str = 'csv'):
     
     today = date.today().strftime('%Y%m%d')
-    df.to_csv(f'{path}{today}_general_sheet.csv', index = False)
\ No newline at end of file
+    if file_format == 'parquet': # keeps the dtypes and the list columns
+        write_parquet(df, f'{path}{today}_general_sheet.parquet')
+    else:
+        df.to_csv(f'{path}{today}_general_sheet.csv', index = False)
\ No newline at end of file
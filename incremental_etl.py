@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Incremental ETL of the babybiome baby sheets, only sheets whose content changed are extracted and reloaded
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import sys
+from functools import lru_cache
+
+from lazy_imports import LazyModule
+from workbook_session import WorkbookSession
+from mapping_registry import file_hash
+from babysheet_extract_transform import prepare_baby_sheet, derive_baby_cols, finalize_baby, merge_babies
+from family_database import (create_replace_baby_sheet_tables, create_fingerprint_table, baby_sheet_tables_exist, load_fingerprints,
+                             forget_fingerprints, save_fingerprints, delete_sample_details, delete_families, insert_baby_sheets)
+from longitudinal_tables import timeline_sources_exist, create_replace_timelines, refresh_timelines
+from snapshot_loading import registry_exists
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+CACHE_DIR = '.etl_cache' # next to the workbook, one directory per workbook
+CACHE_VERSION = 1 # layout of the cached dict (prepare_derived_baby)
+# the code that makes the cached frames, the extraction and the row wise derived columns
+TRANSFORM_MODULES = ['workbook_session', 'sheet_transform', 'babysheet_extract_transform', 'text_classifier', 'value_normalization', __name__]
+DERIVED_INPUT_COLS = ['food_baby1', 'food_baby2', 'food_baby1_notes', 'food_baby2_notes', 'diet_baby', 'diet_baby_notes', 'probiotics_notes']
+
+@lru_cache
+def transform_version():
+    # changes with the cache layout and with the code of the transform modules, after an upgrade every sheet is extracted again
+
+    code = ''.join(file_hash(sys.modules[name].__file__) for name in TRANSFORM_MODULES)
+    return hashlib.sha256(f'{CACHE_VERSION}{code}'.encode()).hexdigest()
+
+def combine_fingerprints(sheet_fingerprints: dict, mapping_paths: list):
+    # a changed mapping file or transform code changes every sheet
+
+    mapping = transform_version() + ''.join(file_hash(path) for path in mapping_paths)
+    return {sheet: hashlib.sha256((fingerprint + mapping).encode()).hexdigest() for sheet, fingerprint in sheet_fingerprints.items()}
+
+def workbook_cache_dir(path: str):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, os.path.splitext(os.path.basename(path))[0])
+
+def cache_path(cache_dir: str, sheet: str):
+    return os.path.join(cache_dir, f'{sheet}.pkl')
+
+def derive_part(df: pd.DataFrame):
+    # row wise derived columns of a part of the babies (one baby or a batch)
+
+    missing = [col for col in DERIVED_INPUT_COLS if col not in df.columns] # would be NaN after merging with the other babies
+    for col in missing:
+        df[col] = pd.Series(np.nan, index = df.index, dtype = object)
+
+    return derive_baby_cols(df).drop(missing, axis = 1)
+
+def prepare_derived_baby(path: str, sheet: str, renaming_path: str, deleting_path: str, session: WorkbookSession):
+    # extraction and the row wise derived columns of one baby
+
+    df = prepare_baby_sheet(path, sheet, renaming_path, deleting_path, session)
+    extracted = list(df.columns)
+
+    return {'columns': extracted, 'frame': derive_part(df)}
+
+def write_cache(baby: dict, fingerprint: str, cache_dir: str, sheet: str):
+    # pickle and not parquet, the extracted columns are often of mixed type
+
+    os.makedirs(cache_dir, exist_ok = True)
+    with open(cache_path(cache_dir, sheet), 'wb') as file:
+        pickle.dump({**baby, 'fingerprint': fingerprint}, file)
+
+def read_cache(cache_dir: str, sheet: str):
+
+    try:
+        with open(cache_path(cache_dir, sheet), 'rb') as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+def merge_derived_babies(babies: list):
+    # same column order as merging first and deriving afterwards
+
+    columns = list(dict.fromkeys(col for baby in babies for col in baby['columns']))
+    derived = [col for col in babies[0]['frame'].columns if col not in babies[0]['columns']]
+
+    return merge_babies([baby['frame'] for baby in babies]).reindex(columns = columns + derived)
+
+def run_incremental(first: int, last: int, skips: list, path: str, renaming_path: str, deleting_path: str, connection, cache_dir: str = None, full: bool = False):
+    # cache_dir: the pickled sheets, next to the workbook by default (workbook_cache_dir)
+
+    if registry_exists(connection): # the tables of main are views of the published snapshot, they can not be changed in place
+        raise ValueError('the database is loaded as snapshots, load it again with --snapshot instead of an incremental run')
+
+    cache_dir = cache_dir or workbook_cache_dir(path)
+    sheets = [f'B{i:03}' for i in range(first, last + 1) if i not in skips]
+    rebuild = full or not baby_sheet_tables_exist(connection)
+    stored = {} if rebuild else load_fingerprints(connection)
+
+    babies, changed = {}, []
+    with WorkbookSession(path) as session:
+        fingerprints = combine_fingerprints(session.fingerprints(sheets), [renaming_path, deleting_path])
+        for sheet in sheets:
+            cached = None if rebuild or stored.get(sheet) != fingerprints[sheet] else read_cache(cache_dir, sheet)
+            if cached is None or cached['fingerprint'] != fingerprints[sheet]:
+                cached = prepare_derived_baby(path, sheet, renaming_path, deleting_path, session)
+                write_cache(cached, fingerprints[sheet], cache_dir, sheet)
+                changed.append(sheet)
+            babies[sheet] = cached
+
+    removed = [sheet for sheet in stored if sheet not in fingerprints]
+    for sheet in removed:
+        if os.path.exists(cache_path(cache_dir, sheet)):
+            os.remove(cache_path(cache_dir, sheet))
+
+    # dtypes and the travel times are inferred over all babies, cheap compared to the extraction
+    df = finalize_baby(merge_derived_babies([babies[sheet] for sheet in sheets]))
+
+    if rebuild:
+        create_replace_baby_sheet_tables(connection)
+        create_fingerprint_table(connection)
+        connection.sql('DELETE FROM sheet_fingerprints')
+    elif changed or removed:
+        # committed on its own (see delete_sample_details), the changed sheets are forgotten with it: if the rest fails the next run
+        # extracts them again, the removed sheets keep their fingerprints until their rows are gone
+        connection.begin()
+        try:
+            forget_fingerprints(changed, connection)
+            delete_sample_details(changed + removed, connection)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    if changed or removed:
+        connection.begin()
+        try:
+            if not rebuild:
+                delete_families(changed + removed, connection)
+            if changed:
+                insert_baby_sheets(df[df['baby'].isin(changed)], connection)
+            save_fingerprints({sheet: fingerprints[sheet] for sheet in changed}, removed, connection)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    if timeline_sources_exist(connection):
+        if rebuild:
+            create_replace_timelines(connection)
+        elif changed or removed:
+            refresh_timelines(connection, changed + removed)
+
+    return df, changed, removed
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Deferred imports of the heavy libraries (pandas, numpy, openpyxl, duckdb, pyarrow), a module is only imported when it is first used
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import importlib
+
+class LazyModule:
+    # stands in for a module, e.g. pd = LazyModule('pandas'), the modules using it need "from __future__ import annotations"
+    # so that the type hints (pd.DataFrame) are not evaluated when the functions are defined
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr: str):
+
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__dict__['_name']}'>"
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Validation of the unpivoted baby sheets and the general sheet tables against the column types and constraints of the database tables,
+    all violations are reported at once before anything is written
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+from lazy_imports import LazyModule
+from typed_schema import TIME_CONVERSIONS, MEMBER_CONVERSIONS, mapping_cache
+from family_database import (MEMBER_TABLES, load_connection, create_replace_baby_sheet_tables, create_replace_general_sheet_tables, member_table_rows,
+                             general_sheet_tables)
+
+pd = LazyModule('pandas')
+
+REPORT_COLUMNS = ['table', 'column', 'check', 'severity', 'rows', 'examples']
+EXAMPLES = 5 # offending key: value pairs per violation
+
+BOOL_TEXT = ['true', 'false', 't', 'f', 'yes', 'no', 'y', 'n', '1', '0'] # text duckdb casts to bool
+INT_MAX = 2**31 - 1
+MAX_TRAVEL_DAYS = 60 # days between sampling and the sample arriving frozen at the lab, see edit_travel_time
+
+# (table, column) -> (lowest, highest) plausible value, outside is only a warning, the insert would still work
+PLAUSIBLE_RANGES = {('collected_samples', 'travel_time'): (0, MAX_TRAVEL_DAYS),
+                    ('baby_health', 'weight'): (0, None),
+                    ('baby_health', 'height'): (0, None),
+                    ('mother_health', 'weight'): (0, None)}
+
+# (table, column, parent table, parent column), not declared in the schema (family is not unique there), see snapshot_loading.FOREIGN_KEYS
+UNDECLARED_REFERENCES = [('collected_samples', 'family', 'families', 'id')]
+
+@mapping_cache('times_path', 'members_path')
+def table_schemas(times_path: str = TIME_CONVERSIONS, members_path: str = MEMBER_CONVERSIONS):
+    # column types and constraints as duckdb creates the tables, read from an in memory database, the ENUMs follow the conversion csvs
+    # columns: table -> [{column, type, nullable, precision, scale, enum labels}], constraints: [(table, type, columns, parent table, parent columns)]
+
+    connection = load_connection(':memory:')
+    try:
+        create_replace_baby_sheet_tables(connection, times_path, members_path)
+        create_replace_general_sheet_tables(connection)
+        columns = {}
+        for table, column, data_type, nullable, precision, scale in connection.sql('''SELECT table_name, column_name, data_type, is_nullable,
+                                                                                      numeric_precision, numeric_scale FROM information_schema.columns
+                                                                                      ORDER BY table_name, ordinal_position''').fetchall():
+            labels = connection.sql(f'SELECT enum_range(NULL::{data_type})').fetchone()[0] if data_type.startswith('ENUM') else None
+            columns.setdefault(table, []).append({'column': column, 'type': data_type, 'nullable': nullable == 'YES',
+                                                  'precision': precision, 'scale': scale, 'labels': labels})
+        constraints = connection.sql('''SELECT table_name, constraint_type, constraint_column_names, referenced_table, referenced_column_names
+                                        FROM duckdb_constraints() WHERE constraint_type IN ('PRIMARY KEY', 'UNIQUE', 'FOREIGN KEY')''').fetchall()
+    finally:
+        connection.close()
+
+    return columns, constraints
+
+def table_frames(long: pd.DataFrame = None, general: pd.DataFrame = None):
+    # the frames the inserts would write, named like the table columns, members of insert_members and tables of load_general_sheet
+
+    columns, _ = table_schemas()
+    frames = {}
+    if long is not None:
+        for table, (members, cols) in MEMBER_TABLES.items():
+            frame = member_table_rows(long, members).reindex(columns = cols)
+            frame.columns = [col['column'] for col in columns[table]]
+            frames[table] = frame.reset_index(drop = True)
+    if general is not None:
+        for table, frame in general_sheet_tables(general).items():
+            frames[table] = frame.set_axis([col['column'] for col in columns[table]], axis = 1)
+
+    return frames
+
+def missing_columns(long: pd.DataFrame):
+    # long columns an insert selects that are not in the frame, the insert would fail on the first of them
+
+    return [(table, col) for table, (_, cols) in MEMBER_TABLES.items() for col in cols if col not in long.columns]
+
+def invalid_values(values: pd.Series, schema: dict):
+    # mask of the non null values duckdb could not cast to the column type, nulls are checked by NOT NULL
+
+    data_type = schema['type']
+    if data_type == 'VARCHAR':
+        return pd.Series(False, index = values.index)
+    present = values.notna()
+
+    if data_type == 'BOOLEAN':
+        if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+            return pd.Series(False, index = values.index)
+        valid = values.astype('string').str.lower().isin(BOOL_TEXT)
+    elif data_type == 'INTEGER' or data_type.startswith('DECIMAL'):
+        numbers = pd.to_numeric(values, errors = 'coerce') if not pd.api.types.is_bool_dtype(values) else values.astype('Int64')
+        limit = INT_MAX if data_type == 'INTEGER' else 10 ** (schema['precision'] - schema['scale'])
+        valid = numbers.notna() & (numbers.abs() < limit)
+    elif data_type == 'DATE':
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return pd.Series(False, index = values.index)
+        valid = pd.to_datetime(values.astype('string'), errors = 'coerce', format = 'ISO8601').notna()
+    elif schema['labels'] is not None:
+        valid = values.astype('string').isin(schema['labels'])
+    else:
+        return pd.Series(False, index = values.index)
+
+    return present & ~valid.fillna(False).astype(bool)
+
+def violation(table: str, column: str, check: str, severity: str, frame: pd.DataFrame, mask: pd.Series):
+    # one line of the report, the examples are key: value of the first offending rows
+
+    rows = frame.loc[mask.to_numpy(dtype = bool)]
+    key = frame.columns[0]
+    examples = [f'{k}: {v}' for k, v in zip(rows[key].head(EXAMPLES), rows[column].head(EXAMPLES))]
+
+    return {'table': table, 'column': column, 'check': check, 'severity': severity, 'rows': len(rows), 'examples': examples}
+
+def check_types(frames: dict):
+
+    columns, _ = table_schemas()
+    found = []
+    for table, frame in frames.items():
+        for schema in columns[table]:
+            values = frame[schema['column']]
+            mask = invalid_values(values, schema)
+            if mask.any():
+                data_type = 'ENUM' if schema['labels'] is not None else schema['type'] # the labels are in the table definition
+                found.append(violation(table, schema['column'], f'type {data_type}', 'error', frame, mask))
+            if not schema['nullable'] and values.isna().any():
+                found.append(violation(table, schema['column'], 'not null', 'error', frame, values.isna()))
+
+    return found
+
+def check_constraints(frames: dict):
+    # primary keys and unique columns without duplicates, foreign keys against the parent frame (if it is validated as well)
+
+    _, constraints = table_schemas()
+    found = []
+    for table, constraint, cols, parent, parent_cols in constraints:
+        if table not in frames:
+            continue
+        frame = frames[table]
+        values = frame[cols[0]]
+        if constraint in ('PRIMARY KEY', 'UNIQUE'):
+            mask = values.notna() & values.duplicated(keep = False)
+            if mask.any():
+                found.append(violation(table, cols[0], constraint.lower(), 'error', frame, mask))
+        elif parent in frames:
+            mask = values.notna() & ~values.isin(frames[parent][parent_cols[0]].dropna())
+            if mask.any():
+                found.append(violation(table, cols[0], f'references {parent}.{parent_cols[0]}', 'error', frame, mask))
+
+    for table, col, parent, parent_col in UNDECLARED_REFERENCES:
+        if table in frames and parent in frames:
+            values = frames[table][col]
+            mask = values.notna() & ~values.isin(frames[parent][parent_col].dropna())
+            if mask.any():
+                found.append(violation(table, col, f'references {parent}.{parent_col}', 'warning', frames[table], mask))
+
+    return found
+
+def check_ranges(frames: dict):
+
+    found = []
+    for (table, col), (lowest, highest) in PLAUSIBLE_RANGES.items():
+        if table not in frames:
+            continue
+        numbers = pd.to_numeric(frames[table][col], errors = 'coerce')
+        mask = pd.Series(False, index = numbers.index)
+        if lowest is not None:
+            mask |= (numbers < lowest).fillna(False)
+        if highest is not None:
+            mask |= (numbers > highest).fillna(False)
+        if mask.any():
+            found.append(violation(table, col, f'range {lowest} to {highest if highest is not None else ""}'.strip(), 'warning', frames[table], mask))
+
+    return found
+
+def validate_load(long: pd.DataFrame = None, general: pd.DataFrame = None):
+    # report of every violation of the unpivoted members (unpivot_members) and/or the general sheet, one row per table, column and check
+    # errors would make an insert fail, warnings are implausible values the database accepts
+
+    found = [{'table': table, 'column': col, 'check': 'missing column', 'severity': 'error', 'rows': len(long), 'examples': []}
+             for table, col in (missing_columns(long) if long is not None else [])]
+    if found:
+        return pd.DataFrame(found, columns = REPORT_COLUMNS) # the table frames can not be built
+
+    frames = table_frames(long, general)
+    found = check_types(frames) + check_constraints(frames) + check_ranges(frames)
+
+    return pd.DataFrame(found, columns = REPORT_COLUMNS)
+
+def report_errors(report: pd.DataFrame):
+    return report[report['severity'] == 'error']
+
+def format_report(report: pd.DataFrame):
+
+    lines = [f'{row.severity} {row.table}.{row.column} ({row.check}): {row.rows} rows, e.g. {", ".join(row.examples)}' for row in report.itertuples()]
+    return '\n'.join(lines) if lines else 'no violations'
+
+def check_load(long: pd.DataFrame = None, general: pd.DataFrame = None):
+    # raises with the complete list of errors, the warnings are returned for the run log
+
+    report = validate_load(long, general)
+    errors = report_errors(report)
+    if not errors.empty:
+        raise ValueError(f'{len(errors)} violations of the database schema, nothing was written:\n' + format_report(errors))
+
+    return report[report['severity'] == 'warning'].to_dict(orient = 'records')
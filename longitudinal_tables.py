@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Materialized per family timelines of the babybiome metadata (feeding, antibiotic exposure, growth), keyed by family and day offset
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+# time points as days (time_point_days of time_point_conversions.csv), {where} restricts the samples to the refreshed families
+SAMPLE_DAYS = '''SELECT s.sample_id, s.family, s.member, s.time_point, CAST(s.time_point_days AS double) AS days
+                 FROM collected_samples s {where}'''
+
+TIMELINES = {
+    # feeding of the babies per time point and whether it changed since the previous time point
+    'feeding_timeline': '''
+        WITH feeding AS (SELECT s.family, s.member, s.days, s.time_point, d.breastmilk, d.formula, d.solids
+                         FROM ({samples}) s JOIN baby_diet d USING (sample_id))
+        SELECT *, coalesce(breastmilk IS DISTINCT FROM lag(breastmilk) OVER w OR formula IS DISTINCT FROM lag(formula) OVER w
+                           OR solids IS DISTINCT FROM lag(solids) OVER w, true) AS feeding_changed
+        FROM feeding WINDOW w AS (PARTITION BY family, member ORDER BY days)''',
+
+    # first and last time points of the feeding modes per baby
+    'feeding_milestones': '''
+        SELECT s.family, s.member,
+               min(s.days) FILTER (WHERE d.solids) AS first_solids_days,
+               arg_min(CAST(s.time_point AS varchar), s.days) FILTER (WHERE d.solids) AS first_solids_time_point,
+               min(s.days) FILTER (WHERE d.formula) AS first_formula_days,
+               max(s.days) FILTER (WHERE d.breastmilk) AS last_breastfed_days
+        FROM ({samples}) s JOIN baby_diet d USING (sample_id)
+        GROUP BY s.family, s.member''',
+
+    # antibiotic courses of every member up to and including each time point
+    'antibiotic_exposure': '''
+        SELECT s.family, s.member, s.days, s.time_point, a.taken,
+               CAST(sum(CAST(coalesce(a.taken, false) AS integer)) OVER (PARTITION BY s.family, s.member ORDER BY s.days
+                                                                          ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS integer) AS exposures
+        FROM ({samples}) s JOIN antibiotics a USING (sample_id)''',
+
+    # weight and height of the babies and the change since the previous measured time point
+    'growth': '''
+        WITH measured AS (SELECT s.family, s.member, s.days, s.time_point, h.weight, h.height
+                          FROM ({samples}) s JOIN baby_health h USING (sample_id)
+                          WHERE h.weight IS NOT NULL OR h.height IS NOT NULL)
+        SELECT *, days - lag(days) OVER w AS days_since_previous,
+               weight - lag(weight) OVER w AS weight_delta,
+               height - lag(height) OVER w AS height_delta,
+               (weight - lag(weight) OVER w) / nullif(days - lag(days) OVER w, 0) AS weight_gain_per_day
+        FROM measured WINDOW w AS (PARTITION BY family, member ORDER BY days)'''}
+
+def timeline_query(name: str, families: bool = False):
+    where = 'WHERE s.family IN (SELECT unnest($families))' if families else ''
+    return TIMELINES[name].format(samples = SAMPLE_DAYS.format(where = where))
+
+def timeline_sources_exist(connection):
+    # the timelines only need the baby sheet tables, the days are in collected_samples
+
+    tables = {row[0] for row in connection.sql('SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()').fetchall()}
+    return {'collected_samples', 'baby_diet', 'antibiotics', 'baby_health'} <= tables
+
+def create_replace_timelines(connection):
+    # full rebuild in the current schema (main or the staging schema of a snapshot)
+
+    for name in TIMELINES:
+        connection.sql(f'CREATE OR REPLACE TABLE {name} AS {timeline_query(name)}')
+
+def refresh_timelines(connection, families: list):
+    # rows of the changed or removed families only, every window is partitioned by family
+
+    connection.begin()
+    try:
+        for name in TIMELINES:
+            connection.execute(f'DELETE FROM {name} WHERE family IN (SELECT unnest($families))', {'families': families})
+            connection.execute(f'INSERT INTO {name} {timeline_query(name, True)}', {'families': families})
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
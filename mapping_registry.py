@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Lookup tables of the babybiome metadata (renaming, deleting, conversions, duplicate rules), loaded once and cached on disk
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import sys
+
+from lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+
+RENAMING_FILES = ['baby_sheet_renaming.xlsx', 'general_renaming.xlsx']
+DELETING_FILES = ['baby_sheet_deleting.xlsx', 'general_deleting.xlsx']
+CONVERSION_FILES = ['time_point_conversions.csv', 'family_member_conversions.csv']
+RULE_FILES = ['duplicate_rules.csv']
+CACHE_DIR = '.mapping_cache'
+
+# all tables in one file, read by memory map without pandas (see build_bundle)
+BUNDLE = 'metadata_bundle.bin'
+BUNDLE_MAGIC = b'babybiome metadata bundle 1\n'
+
+def file_hash(path: str):
+
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def file_stamp(path: str):
+    # mtime and size, what the registry compares to find a changed file
+
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def read_renaming(path: str):
+    # full rename set, labels and their _notes counterparts
+
+    new_names = dict(pd.read_excel(path).values) # has to be excel bc of sonderzeichen
+    new_names_notes = {key + "_notes": value + "_notes" for key, value in new_names.items()}
+
+    return {**new_names, **new_names_notes}
+
+def read_deleting(path: str):
+    # full drop set, labels and their _notes counterparts
+
+    delete_names = pd.read_excel(path)["Old"].to_list() # has to be excel bc of sonderzeichen
+
+    return delete_names + [name + "_notes" for name in delete_names]
+
+def read_conversions(path: str):
+    # conversion csv as column lists, pd.DataFrame(...) gives the frame of read_csv back
+
+    return pd.read_csv(path, sep = ';', decimal = ',', encoding = 'utf-8-sig').to_dict(orient = 'list')
+
+def read_rules(path: str):
+    return pd.read_csv(path, sep = ';', dtype = str, encoding = 'utf-8-sig').to_dict(orient = 'list')
+
+def read_bundle(path: str):
+    # marshal reads the tables straight from the mapped file, None if there is no (readable) bundle
+
+    try:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+            if mapped[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+                return None
+            with memoryview(mapped)[len(BUNDLE_MAGIC):] as view:
+                return marshal.loads(view)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+class MappingRegistry:
+    # every mapping file is read at most once per process, and only again from excel when its content changed
+    # lookup order: this process, the bundle, the json cache of the file, the file itself
+
+    readers = {'renaming': read_renaming, 'deleting': read_deleting, 'conversions': read_conversions, 'rules': read_rules}
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir # None: cache next to the mapping file
+        self.tables = {}
+        self.bundles = {} # bundle path -> its tables
+
+    def cache_dir_of(self, path: str):
+        return self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+
+    def cache_path(self, path: str, kind: str):
+        return os.path.join(self.cache_dir_of(path), f'{os.path.basename(path)}.{kind}.json')
+
+    def bundle_path(self, path: str):
+        return os.path.join(self.cache_dir_of(path), BUNDLE)
+
+    def bundle_entry(self, path: str, kind: str, stat):
+        # only used if the file is unchanged since the bundle was built
+
+        bundle = self.bundle_path(path)
+        if bundle not in self.bundles:
+            self.bundles[bundle] = (read_bundle(bundle) or {}).get('tables', {})
+        entry = self.bundles[bundle].get(f'{os.path.basename(path)}.{kind}')
+        if entry is not None and (entry['mtime_ns'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+            return entry
+
+        return None
+
+    def load_cache(self, path: str, kind: str, stat):
+
+        try:
+            with open(self.cache_path(path, kind), encoding = 'utf-8') as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if (cache['mtime_ns'], cache['size']) == (stat.st_mtime_ns, stat.st_size):
+            return cache
+        if cache['sha256'] == file_hash(path): # touched but not changed
+            self.write_cache(path, kind, stat, cache['sha256'], cache['table'])
+            return cache
+
+        return None
+
+    def write_cache(self, path: str, kind: str, stat, sha256: str, table):
+
+        cache = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256, 'table': table}
+        try:
+            os.makedirs(os.path.dirname(self.cache_path(path, kind)), exist_ok = True)
+            with open(self.cache_path(path, kind), 'w', encoding = 'utf-8') as file:
+                json.dump(cache, file, ensure_ascii = False, separators = (',', ':'))
+        except OSError:
+            pass # cache is optional, e.g. read only checkout
+
+        return cache
+
+    def table(self, path: str, kind: str):
+
+        stat = os.stat(path)
+        key = (os.path.abspath(path), kind)
+        cached = self.tables.get(key)
+        if cached is not None and (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+            return cached['table']
+
+        cached = self.bundle_entry(path, kind, stat) or self.load_cache(path, kind, stat)
+        if cached is None:
+            cached = self.write_cache(path, kind, stat, file_hash(path), self.readers[kind](path))
+
+        self.tables[key] = cached
+        return cached['table']
+
+    def renaming(self, path: str):
+        return self.table(path, 'renaming')
+
+    def deleting(self, path: str):
+        return self.table(path, 'deleting')
+
+    def conversions(self, path: str):
+        return self.table(path, 'conversions')
+
+    def rules(self, path: str):
+        return self.table(path, 'rules')
+
+    def bundle_sources(self, renaming_paths: list = RENAMING_FILES, deleting_paths: list = DELETING_FILES,
+                       conversion_paths: list = CONVERSION_FILES, rule_paths: list = RULE_FILES):
+        return ([(path, 'renaming') for path in renaming_paths] + [(path, 'deleting') for path in deleting_paths] +
+                [(path, 'conversions') for path in conversion_paths] + [(path, 'rules') for path in rule_paths])
+
+    def build_bundle(self, sources: list = None):
+        # sources: (path, kind) of one directory, written to a temporary file first so that readers never map a half written bundle
+
+        sources = sources or self.bundle_sources()
+        bundles = {self.bundle_path(path) for path, _ in sources}
+        if len(bundles) > 1:
+            raise ValueError(f'the bundled files have to be in one directory: {sorted(path for path, _ in sources)}')
+        bundle = bundles.pop()
+
+        tables = {}
+        for path, kind in sources:
+            self.table(path, kind)
+            tables[f'{os.path.basename(path)}.{kind}'] = self.tables[(os.path.abspath(path), kind)]
+
+        os.makedirs(os.path.dirname(bundle), exist_ok = True)
+        with open(bundle + '.tmp', 'wb') as file:
+            file.write(BUNDLE_MAGIC + marshal.dumps({'tables': tables}))
+        os.replace(bundle + '.tmp', bundle)
+        self.bundles.pop(bundle, None)
+
+        return bundle
+
+    def stale_sources(self, sources: list = None):
+        # files that are not in the bundle or changed since it was built, without reading any of them
+
+        return [path for path, kind in sources or self.bundle_sources() if self.bundle_entry(path, kind, os.stat(path)) is None]
+
+    def preload(self, renaming_paths: list = RENAMING_FILES, deleting_paths: list = DELETING_FILES):
+        # before worker processes are forked, they then start with the tables in memory
+
+        for path in renaming_paths:
+            self.renaming(path)
+        for path in deleting_paths:
+            self.deleting(path)
+
+REGISTRY = MappingRegistry()
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Bundle of the babybiome lookup tables (mapping xlsx files, conversions, duplicate rules)')
+    parser.add_argument('command', choices = ['build', 'check'], help = 'check exits with 1 if the bundle is missing or out of date')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(REGISTRY.build_bundle())
+        return
+
+    stale = REGISTRY.stale_sources()
+    if stale:
+        print('out of date: ' + ', '.join(stale))
+        sys.exit(1)
+    print('bundle is up to date')
+
+if __name__ == '__main__':
+    main()
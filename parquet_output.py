@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Arrow/Parquet output of the cleaned babybiome metadata, dtypes (dates, nullable types, lists) are kept for the readers
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import os
+
+from lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+pa = LazyModule('pyarrow')
+ds = LazyModule('pyarrow.dataset')
+pq = LazyModule('pyarrow.parquet')
+
+def mixed_columns(df: pd.DataFrame):
+    # object columns arrow can not type, e.g. answers that are partly numbers and partly text
+
+    mixed = []
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas = True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mixed.append(col)
+
+    return mixed
+
+def to_arrow(df: pd.DataFrame):
+    # mixed columns are passed on as text, everything else keeps its type (pandas metadata restores the nullable dtypes)
+
+    mixed = mixed_columns(df)
+    if mixed:
+        df = df.copy()
+        for col in mixed:
+            df[col] = df[col].map(str, na_action = 'ignore').astype(object)
+
+    return pa.Table.from_pandas(df, preserve_index = False)
+
+def write_parquet(df: pd.DataFrame, path: str, partition_cols: list = None, basename_template: str = None):
+    # one file, or a hive partitioned dataset directory (e.g. baby=B001/time_point=2Wochen/) with partition_cols
+    # basename_template (e.g. 'batch-00003-{i}.parquet') lets several writes append to the same dataset
+
+    table = to_arrow(df)
+    if partition_cols:
+        pq.write_to_dataset(table, root_path = path, partition_cols = partition_cols, basename_template = basename_template)
+    else:
+        pq.write_table(table, path)
+
+def unify_field(known: pa.Field, field: pa.Field):
+    # all null < any type, numbers are widened, otherwise the column is read as text
+
+    if pa.types.is_null(known.type):
+        return field
+    if pa.types.is_null(field.type) or known.type == field.type:
+        return known
+    try:
+        return pa.unify_schemas([pa.schema([known]), pa.schema([field])], promote_options = 'permissive').field(0)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.field(known.name, pa.string())
+
+def unified_schema(path: str):
+    # files written batch by batch can have different dtypes for the same column (dtypes are inferred per batch)
+
+    dataset = ds.dataset(path, format = 'parquet', partitioning = 'hive')
+    fields = {}
+    for fragment in dataset.get_fragments():
+        for field in fragment.physical_schema:
+            fields[field.name] = unify_field(fields[field.name], field) if field.name in fields else field
+    partitions = [field for field in dataset.schema if field.name not in fields]
+
+    return pa.schema(list(fields.values()) + partitions)
+
+def read_parquet(path: str, columns: list = None, filters: list = None):
+    # memory mapped and only the requested columns, duckdb reads the same files with read_parquet('path/**/*.parquet', hive_partitioning = true)
+
+    schema = unified_schema(path) if os.path.isdir(path) else None
+    return pq.read_table(path, columns = columns, filters = filters, schema = schema, memory_map = True).to_pandas()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Per stage wall time, rows and peak memory of the babybiome metadata ETL, written as a JSON run log
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import cProfile
+import json
+import os
+import resource
+import time
+import tracemalloc
+from datetime import datetime
+
+def count_rows(obj):
+    return len(obj) if hasattr(obj, '__len__') and hasattr(obj, 'columns') else None
+
+class RunLog:
+    # profiler: 'cprofile' or 'pyinstrument' (optional dependency), one dump per stage in profile_dir
+    # trace_memory: tracemalloc peak per stage, slows the stages down noticeably
+
+    def __init__(self, profile_dir: str = None, profiler: str = 'cprofile', trace_memory: bool = True):
+        self.started = datetime.now().isoformat(timespec = 'seconds')
+        self.stages = []
+        self.section = None # set by the runner, e.g. 'baby' or 'general'
+        self.run_id = None # snapshot of the run, if loaded as one
+        self.validation = [] # warnings of the validation before loading (load_validation)
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def run(self, name: str, func, *args, **kwargs):
+
+        rows_in = count_rows(args[0]) if args else None
+        profiler = self.start_profiler()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+
+        result = func(*args, **kwargs)
+
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+        self.stop_profiler(profiler, name)
+        self.stages.append({'section': self.section, 'stage': name, 'seconds': round(seconds, 4), 'rows_in': rows_in, 'rows_out': count_rows(result),
+                            'peak_memory_mb': round(peak / 2**20, 2) if peak is not None else None})
+
+        return result
+
+    def start_profiler(self):
+
+        if self.profile_dir is None:
+            return None
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler # only needed for this option
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        return profiler
+
+    def stop_profiler(self, profiler, name: str):
+
+        if profiler is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok = True)
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            with open(os.path.join(self.profile_dir, f'{len(self.stages):02}_{name}.html'), 'w') as file:
+                file.write(profiler.output_html())
+        else:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f'{len(self.stages):02}_{name}.prof'))
+
+    def report(self):
+        return {'started': self.started,
+                'run_id': self.run_id,
+                'validation': self.validation,
+                'total_seconds': round(sum(stage['seconds'] for stage in self.stages), 4),
+                'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2), # kilobytes on linux
+                'stages': self.stages}
+
+    def write(self, path: str):
+
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent = 2)
+
+def run_step(log: RunLog, func, *args, **kwargs):
+    # plain call without a run log
+
+    if log is None:
+        return func(*args, **kwargs)
+    return log.run(func.__name__, func, *args, **kwargs)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Batched sample metadata lookup for the sequencing and QC pipelines, read only connections per lookup, LRU cache and an optional local HTTP front end
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from lazy_imports import LazyModule
+from mapping_registry import file_stamp
+from snapshot_loading import registry_exists, snapshot_schema
+from typed_schema import enum_values
+
+duckdb = LazyModule('duckdb')
+pd = LazyModule('pandas')
+
+# one row per sample, the member specific tables are empty for the other members
+SAMPLE_COLUMNS = ['sample_id', 'family', 'time_point', 'time_point_days', 'member', 'sampling_date', 'frozen_date', 'travel_time', 'oral_kit', 'faeces_kit',
+                  'bowel_movements', 'sampling_notes', 'antibiotics_taken', 'antibiotics_notes', 'probiotics_taken', 'probiotics_bifido',
+                  'probiotics_ecoli', 'probiotics_lakt', 'probiotics_notes', 'solids', 'formula', 'breastmilk', 'special_diet', 'pacifier',
+                  'diet_notes', 'baby_weight', 'baby_height', 'illness', 'latest_u_results', 'hospital', 'mother_weight', 'diabetes',
+                  'diabetes_treatment']
+
+SAMPLE_QUERY = '''SELECT s.*, a.taken AS antibiotics_taken, a.notes AS antibiotics_notes,
+                  p.taken AS probiotics_taken, p.bifido AS probiotics_bifido, p.ecoli AS probiotics_ecoli, p.lakt AS probiotics_lakt, p.notes AS probiotics_notes,
+                  d.solids, d.formula, d.breastmilk, d.special_diet, d.pacifier, d.notes AS diet_notes,
+                  h.weight AS baby_weight, h.height AS baby_height, h.illness, h.latest_u_results, h.hospital,
+                  m.weight AS mother_weight, m.diabetes, m.diabetes_treatment
+                  FROM {schema}.collected_samples s
+                  LEFT JOIN {schema}.antibiotics a USING (sample_id)
+                  LEFT JOIN {schema}.probiotics p USING (sample_id)
+                  LEFT JOIN {schema}.baby_diet d USING (sample_id)
+                  LEFT JOIN {schema}.baby_health h USING (sample_id)
+                  LEFT JOIN {schema}.mother_health m USING (sample_id)'''
+
+IDS_QUERY = SAMPLE_QUERY + ' WHERE s.sample_id IN (SELECT unnest(?))'
+FAMILY_QUERY = SAMPLE_QUERY + ' WHERE s.family = {family} ORDER BY s.time_point, s.member' # enums, chronological and in member order
+
+def database_stamp(path: str):
+    # mtime and size of the database and of its write ahead log, every commit of a load (or a published snapshot) changes one of them
+
+    stamps = []
+    for file in [path, path + '.wal']:
+        try:
+            stamps.append(file_stamp(file))
+        except FileNotFoundError:
+            stamps.append(None)
+
+    return tuple(stamps)
+
+class SampleLookup:
+    # the cache is keyed by sample_id and cleared whenever the database file changed (a load into main or another current snapshot)
+    # no connection is kept open between two lookups, a read only connection holds the file lock and a load from another process would fail
+
+    def __init__(self, path: str, pool_size: int = 4, cache_size: int = 100000):
+        self.path = path
+        self.connections = threading.BoundedSemaphore(pool_size) # lookups that query the database at the same time
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_stamp = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+
+        with self.lock:
+            self.cache.clear()
+            self.cache_stamp = None
+
+    @contextmanager
+    def cursor(self):
+
+        with self.connections:
+            connection = duckdb.connect(self.path, read_only = True)
+            try:
+                yield connection
+            finally:
+                connection.close()
+
+    def current_schema(self, cursor, run_id: str = None):
+        # main of a database without snapshots
+
+        if run_id is None and not registry_exists(cursor):
+            return 'main'
+        return snapshot_schema(cursor, run_id)
+
+    def cached(self, stamp: tuple, ids: list):
+
+        with self.lock:
+            if stamp != self.cache_stamp:
+                self.cache.clear()
+                self.cache_stamp = stamp
+            found = {}
+            for sample_id in ids:
+                if sample_id in self.cache:
+                    self.cache.move_to_end(sample_id)
+                    found[sample_id] = self.cache[sample_id]
+
+        return found
+
+    def store(self, stamp: tuple, rows: dict):
+
+        with self.lock:
+            if stamp != self.cache_stamp:
+                return
+            self.cache.update(rows)
+            for sample_id in rows:
+                self.cache.move_to_end(sample_id)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+
+    def query(self, cursor, schema: str, ids: list):
+        # one join for the whole batch, unknown ids are cached as None as well
+
+        df = cursor.execute(IDS_QUERY.format(schema = schema), [ids]).df()
+        rows = {sample_id: None for sample_id in ids}
+        rows.update({record['sample_id']: record for record in df.to_dict(orient = 'records')})
+
+        return rows
+
+    def get_samples(self, ids: list, run_id: str = None):
+        # metadata of the samples in the order of ids, ids that are not in the snapshot are left out, cached ids need no connection
+        # run_id: an older snapshot, bypasses the cache
+
+        ids = list(dict.fromkeys(ids))
+        if run_id is not None:
+            with self.cursor() as cursor:
+                rows = self.query(cursor, self.current_schema(cursor, run_id), ids)
+        else:
+            stamp = database_stamp(self.path) # before the query, a load in between clears the rows again with the next lookup
+            rows = self.cached(stamp, ids)
+            missing = [sample_id for sample_id in ids if sample_id not in rows]
+            if missing:
+                with self.cursor() as cursor:
+                    queried = self.query(cursor, self.current_schema(cursor), missing)
+                self.store(stamp, queried)
+                rows.update(queried)
+
+        return pd.DataFrame([rows[sample_id] for sample_id in ids if rows[sample_id] is not None], columns = SAMPLE_COLUMNS)
+
+    def get_records(self, ids: list = None, family: str = None, run_id: str = None):
+        # plain rows of the samples or of a whole family, without pandas and the cache (one shot lookups of the command line)
+        # the values are quoted sql literals, duckdb imports pandas to look at python parameters
+
+        if family is None and not ids:
+            return []
+        with self.cursor() as cursor:
+            schema = self.current_schema(cursor, run_id)
+            if family is not None:
+                cursor.execute(FAMILY_QUERY.format(schema = schema, family = enum_values([family])))
+            else:
+                cursor.execute(SAMPLE_QUERY.format(schema = schema) + f' WHERE s.sample_id IN ({enum_values(dict.fromkeys(ids))})')
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        if family is None:
+            position = {sample_id: i for i, sample_id in enumerate(dict.fromkeys(ids))}
+            rows.sort(key = lambda row: position[row['sample_id']])
+
+        return rows
+
+def json_value(value):
+    # dates and numeric (decimal) values of the duckdb rows
+
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def lookup_handler(lookup: SampleLookup):
+    # GET /samples?ids=B001-M-vor,B001-B-2Wochen[&run_id=...] or POST /samples with {"ids": [...], "run_id": ...}
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def respond(self, status: int, body: str):
+
+            data = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def answer(self, ids: list, run_id: str = None):
+
+            try:
+                samples = lookup.get_samples(ids, run_id)
+            except (ValueError, duckdb.Error) as error:
+                self.respond(400, json.dumps({'error': str(error)}))
+                return
+            self.respond(200, samples.to_json(orient = 'records', date_format = 'iso'))
+
+        def do_GET(self):
+
+            url = urlparse(self.path)
+            if url.path != '/samples':
+                self.respond(404, json.dumps({'error': 'use /samples'}))
+                return
+            query = parse_qs(url.query)
+            ids = [sample_id for value in query.get('ids', []) for sample_id in value.split(',') if sample_id]
+            self.answer(ids, query.get('run_id', [None])[0])
+
+        def do_POST(self):
+
+            if urlparse(self.path).path != '/samples':
+                self.respond(404, json.dumps({'error': 'use /samples'}))
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            except json.JSONDecodeError:
+                self.respond(400, json.dumps({'error': 'body is not JSON'}))
+                return
+            self.answer(body.get('ids', []), body.get('run_id'))
+
+        def log_message(self, format, *args):
+            pass # no line per request on stderr
+
+    return Handler
+
+def serve(path: str, host: str = '127.0.0.1', port: int = 8765, pool_size: int = 4):
+
+    with SampleLookup(path, pool_size) as lookup:
+        server = ThreadingHTTPServer((host, port), lookup_handler(lookup))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Local HTTP front end of the babybiome sample lookup, or a one shot lookup with --ids/--family')
+    parser.add_argument('database')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('--pool-size', type = int, default = 4, help = 'lookups that query the database at the same time')
+    parser.add_argument('--ids', help = 'comma separated sample_ids, printed as JSON instead of serving')
+    parser.add_argument('--family', help = 'all samples of a family (B###), printed as JSON instead of serving')
+    parser.add_argument('--run-id', help = 'snapshot of --ids/--family, the current one by default')
+    args = parser.parse_args()
+
+    if args.ids is None and args.family is None:
+        serve(args.database, args.host, args.port, args.pool_size)
+        return
+
+    with SampleLookup(args.database, pool_size = 1) as lookup:
+        ids = [sample_id for sample_id in (args.ids or '').split(',') if sample_id]
+        print(json.dumps(lookup.get_records(ids, args.family, args.run_id), default = json_value, ensure_ascii = False))
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,18 @@ CREATE TABLE "member_conversions" (
   "spelled" varchar
 );
 
+CREATE TYPE "time_point_enum" AS ENUM ('vor', '2Wochen', '4Wochen', '2Monate', '3Monate', '5Monate', '6Monate', '9Monate', '12Monate', '13Monate', '14Monate', '17Monate', '24Monate');
+
+CREATE TYPE "member_enum" AS ENUM ('M', 'B', 'F', 'S', 'C', 'T');
+
+CREATE TYPE "smoking_enum" AS ENUM ('never', 'no', 'yes', 'previously');
+
 CREATE TABLE "collected_samples" (
   "sample_id" varchar PRIMARY KEY,
   "family" varchar(4),
-  "time_point" varchar,
-  "member" varchar,
+  "time_point" time_point_enum,
+  "time_point_days" number,
+  "member" member_enum,
   "sampling_date" date,
   "frozen_date" date,
   "travel_time" int,
@@ -89,7 +96,7 @@ CREATE TABLE "mother_details" (
   "weight_pre_pregnancy" number,
   "height" integer,
   "weight_pre_birth" number,
-  "smoke" varchar,
+  "smoke" smoking_enum,
   "alcohol" bool,
   "medicine" varchar,
   "supplements" varchar,
@@ -99,7 +106,7 @@ CREATE TABLE "mother_details" (
 
 CREATE TABLE "family_health" (
   "id" varchar(4),
-  "father_smoke" varchar,
+  "father_smoke" smoking_enum,
   "sibling_disease" varchar,
   "lactose_int" bool,
   "celiac" bool,
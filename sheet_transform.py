@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Transformation steps shared by the baby sheets and the general sheet of the babybiome questionnaire workbook
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+from lazy_imports import LazyModule
+from mapping_registry import REGISTRY
+from typed_schema import apply_types, baby_sheet_types
+
+pd = LazyModule('pandas')
+
+def merge_normal_notes(df1: pd.DataFrame, df2: pd.DataFrame):
+    return pd.concat([df1, df2], axis = 0)
+
+def set_col_names(df: pd.DataFrame, path: str):
+
+    df.columns = df.iloc[0]
+    df = df.iloc[1:, :].copy()
+    df.reset_index(drop = True, inplace = True)
+
+    df.rename(REGISTRY.renaming(path), axis = 1, inplace = True, errors = 'ignore') # includes the _notes names
+
+    return df
+
+def deleting_cols(df: pd.DataFrame, path: str):
+
+    df.drop(REGISTRY.deleting(path), axis = 1, inplace = True, errors = 'ignore') # includes the _notes names
+
+    return df
+
+def col_type_changes(df: pd.DataFrame):
+    return apply_types(df.convert_dtypes(), baby_sheet_types()) # fixed categories for the repeating values
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Snapshot versioned loading of the babybiome metadata, every run is loaded into its own schema, validated and then swapped in
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+from lazy_imports import LazyModule
+from family_database import BABIES, MOTHERS, general_sheet_tables
+from longitudinal_tables import TIMELINES
+
+pd = LazyModule('pandas')
+
+SNAPSHOT_PREFIX = 'snapshot_'
+
+# children before their parents, the order the former tables of main are dropped in
+SNAPSHOT_TABLES = ['antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health', 'collected_samples',
+                   'diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details', 'families',
+                   'time_conversions', 'member_conversions', *TIMELINES]
+
+# (table, column, parent table, parent column), collected_samples.family is not declared in the schema but checked as well
+FOREIGN_KEYS = [*[(table, 'sample_id', 'collected_samples', 'sample_id') for table in ['antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health']],
+                *[(table, 'id', 'families', 'id') for table in ['diabetes', 'mother_details', 'family_health', 'household_details', 'birth_details']],
+                ('collected_samples', 'family', 'families', 'id')]
+
+def create_snapshot_registry(connection):
+
+    connection.sql('''
+                    CREATE TABLE IF NOT EXISTS main."snapshots" (
+                    "run_id" varchar PRIMARY KEY,
+                    "schema_name" varchar,
+                    "created" timestamp,
+                    "published" timestamp,
+                    "is_current" bool,
+                    "row_counts" varchar
+                    );
+                   ''')
+
+def schema_name(run_id: str):
+    return SNAPSHOT_PREFIX + run_id
+
+def new_run_id(connection):
+    # date and time of the run, a suffix if a run of the same second exists
+
+    create_snapshot_registry(connection)
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    taken = {row[0] for row in connection.sql('SELECT run_id FROM main.snapshots').fetchall()}
+    suffix = 1
+    while run_id + (f'_{suffix}' if suffix > 1 else '') in taken:
+        suffix += 1
+
+    return run_id + (f'_{suffix}' if suffix > 1 else '')
+
+@contextmanager
+def staging(connection, run_id: str):
+    # the unqualified DDL and inserts of family_database go into the staging schema of the run, dropped again on errors
+
+    schema = schema_name(run_id)
+    database = connection.sql('SELECT current_database()').fetchone()[0]
+    create_snapshot_registry(connection)
+    connection.sql(f'CREATE SCHEMA {schema}')
+    connection.execute('INSERT INTO main.snapshots VALUES (?, ?, current_timestamp, NULL, false, NULL)', [run_id, schema])
+    connection.sql(f'USE {database}.{schema}')
+    try:
+        yield schema
+    except Exception:
+        connection.sql(f'USE {database}.main')
+        drop_snapshot(connection, run_id)
+        raise
+    finally:
+        connection.sql(f'USE {database}.main')
+
+def expected_counts(long: pd.DataFrame, general: pd.DataFrame):
+    # rows every table has to have after loading the unpivoted members and the general sheet
+
+    babies = int(long['spelled'].isin(BABIES).sum())
+    mothers = int(long['spelled'].isin(MOTHERS).sum())
+    counts = {'collected_samples': len(long), 'antibiotics': len(long), 'probiotics': len(long), 'baby_diet': babies, 'baby_health': babies, 'mother_health': mothers}
+
+    return {**counts, **{table: len(frame) for table, frame in general_sheet_tables(general).items()}}
+
+def row_counts(connection, schema: str):
+    return {table: connection.sql(f'SELECT count(*) FROM {schema}.{table}').fetchone()[0] for table in SNAPSHOT_TABLES}
+
+def validate_snapshot(connection, schema: str, expected: dict = None):
+    # list of problems, empty if the snapshot can be published
+
+    counts = row_counts(connection, schema)
+    problems = [f'{table}: {counts[table]} rows, expected {rows}' for table, rows in (expected or {}).items() if counts[table] != rows]
+    if counts['collected_samples'] == 0:
+        problems.append('collected_samples is empty')
+
+    for table, col, parent, parent_col in FOREIGN_KEYS:
+        orphans = connection.sql(f'''SELECT count(*) FROM {schema}.{table} c WHERE c.{col} IS NOT NULL
+                                 AND NOT EXISTS (SELECT 1 FROM {schema}.{parent} p WHERE p.{parent_col} = c.{col})''').fetchone()[0]
+        if orphans:
+            problems.append(f'{table}.{col}: {orphans} rows without {parent}.{parent_col}')
+
+    return problems, counts
+
+def publish_snapshot(connection, run_id: str, expected: dict = None):
+    # the views of main are replaced in one transaction, readers see either the previous or the new snapshot
+
+    schema = schema_name(run_id)
+    problems, counts = validate_snapshot(connection, schema, expected)
+    if problems:
+        drop_snapshot(connection, run_id)
+        raise ValueError(f'snapshot {run_id} failed validation: ' + '; '.join(problems))
+
+    legacy = {row[0] for row in connection.sql('''SELECT table_name FROM information_schema.tables
+                                                  WHERE table_catalog = current_database() AND table_schema = 'main'
+                                                  AND table_type = 'BASE TABLE' ''').fetchall()} # not the tables of attached databases
+    connection.begin()
+    try:
+        for table in SNAPSHOT_TABLES: # tables of the former drop and reload loading
+            if table in legacy:
+                connection.sql(f'DROP TABLE main.{table}')
+        for table in SNAPSHOT_TABLES:
+            connection.sql(f'CREATE OR REPLACE VIEW main.{table} AS SELECT * FROM {schema}.{table}')
+        connection.sql('UPDATE main.snapshots SET is_current = false WHERE is_current')
+        connection.execute('UPDATE main.snapshots SET published = current_timestamp, is_current = true, row_counts = ? WHERE run_id = ?',
+                           [json.dumps(counts), run_id])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return counts
+
+def drop_snapshot(connection, run_id: str):
+
+    connection.sql(f'DROP SCHEMA IF EXISTS {schema_name(run_id)} CASCADE')
+    connection.execute('DELETE FROM main.snapshots WHERE run_id = ?', [run_id])
+
+def registry_exists(connection):
+    # the read functions below also work on read only connections and databases without snapshots
+
+    tables = connection.sql('''SELECT table_name FROM information_schema.tables WHERE table_schema = 'main' AND table_name = 'snapshots' ''').fetchall()
+    return len(tables) > 0
+
+def list_snapshots(connection):
+
+    if not registry_exists(connection):
+        return pd.DataFrame(columns = ['run_id', 'schema_name', 'created', 'published', 'is_current', 'row_counts'])
+    return connection.sql('SELECT * FROM main.snapshots ORDER BY created').df()
+
+def current_run_id(connection):
+
+    if not registry_exists(connection):
+        return None
+    row = connection.sql('SELECT run_id FROM main.snapshots WHERE is_current').fetchone()
+    return row[0] if row else None
+
+def snapshot_schema(connection, run_id: str = None, on = None):
+    # schema of a run, of the last snapshot published on or before a date, or of the current snapshot
+
+    if not registry_exists(connection):
+        raise ValueError('no snapshots in this database')
+    if run_id is not None:
+        row = connection.execute('SELECT schema_name FROM main.snapshots WHERE run_id = ? AND published IS NOT NULL', [run_id]).fetchone()
+    elif on is not None:
+        row = connection.execute('''SELECT schema_name FROM main.snapshots WHERE published < CAST(? AS date) + INTERVAL 1 DAY
+                                    ORDER BY published DESC LIMIT 1''', [str(on)]).fetchone()
+    else:
+        row = connection.sql('SELECT schema_name FROM main.snapshots WHERE is_current').fetchone()
+    if row is None:
+        raise ValueError(f'no published snapshot for run_id = {run_id}, on = {on}')
+
+    return row[0]
+
+def prune_snapshots(connection, keep: int = 10):
+    # keeps the newest published snapshots (always the current one), unpublished leftovers are dropped
+
+    snapshots = list_snapshots(connection)
+    published = snapshots[snapshots['published'].notna()].sort_values('published', ascending = False)
+    kept = set(published['run_id'][:keep]) | set(snapshots.loc[snapshots['is_current'].fillna(False).astype(bool), 'run_id'])
+    dropped = [run_id for run_id in snapshots['run_id'] if run_id not in kept]
+    for run_id in dropped:
+        drop_snapshot(connection, run_id)
+
+    return dropped
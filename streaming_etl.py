@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Streaming ETL of the babybiome baby sheets, babies are processed in fixed size batches and appended to DuckDB and/or Parquet
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import os
+
+from lazy_imports import LazyModule
+from mapping_registry import REGISTRY
+from workbook_session import WorkbookSession
+from babysheet_extract_transform import prepare_baby_sheet, merge_babies, col_type_changes, edit_travel_time, removing_duplicates
+from incremental_etl import derive_part
+from family_database import MEMBER_CONVERSIONS, create_replace_baby_sheet_tables, unpivot_members, insert_members
+from parquet_output import write_parquet
+
+pd = LazyModule('pandas')
+
+BATCH_SIZE = 25
+
+def batch_sheets(sheets: list, batch_size: int):
+    return [sheets[start:start + batch_size] for start in range(0, len(sheets), batch_size)]
+
+def expected_columns(renaming_path: str, deleting_path: str):
+    # every renamed question (and its notes) that is not deleted, a batch of sheets may miss some of them
+    deleted = set(REGISTRY.deleting(deleting_path))
+    return [col for col in dict.fromkeys(REGISTRY.renaming(renaming_path).values()) if col not in deleted]
+
+def date_cols(columns: list):
+    return [col for col in columns if col == 'date' or (col.startswith('probe_date_') and not col.endswith('_notes'))]
+
+def complete_batch(df: pd.DataFrame, columns: list):
+    # questions missing in the batch as NA, the dates as datetime even if the batch has none (edit_travel_time subtracts them)
+
+    df = df.reindex(columns = list(df.columns) + [col for col in columns if col not in df.columns])
+    df = col_type_changes(derive_part(df))
+    for col in date_cols(df.columns):
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+
+    return df
+
+def stream_babies(first: int, last: int, skips: list, path: str, renaming_path: str, deleting_path: str, batch_size: int = BATCH_SIZE,
+                  session: WorkbookSession = None):
+    # one cleaned frame per batch, only the current batch is held in memory
+    # dtypes are inferred per batch, the tables cast on insert and read_parquet unifies the batch files, see complete_batch for what has to be fixed
+    # session: open session of the whole run, otherwise one is opened for the stream
+
+    if session is None:
+        with WorkbookSession(path) as session:
+            yield from stream_babies(first, last, skips, path, renaming_path, deleting_path, batch_size, session)
+        return
+
+    sheets = [f'B{i:03}' for i in range(first, last + 1) if i not in skips]
+    columns = expected_columns(renaming_path, deleting_path)
+    for batch in batch_sheets(sheets, batch_size):
+        df = merge_babies([prepare_baby_sheet(path, sheet, renaming_path, deleting_path, session) for sheet in batch])
+        yield edit_travel_time(complete_batch(df, columns))
+
+def append_parquet(df, path: str, batch: int, partition_cols: list = None):
+    # one file per batch in the dataset directory
+
+    if partition_cols:
+        write_parquet(df, path, partition_cols, basename_template = f'batch-{batch:05}-{{i}}.parquet')
+    else:
+        os.makedirs(path, exist_ok = True)
+        write_parquet(df, os.path.join(path, f'batch-{batch:05}.parquet'))
+
+def run_streaming(first: int, last: int, skips: list, path: str, renaming_path: str, deleting_path: str, connection = None,
+                  parquet_path: str = None, partition_cols: list = None, batch_size: int = BATCH_SIZE, members_path: str = MEMBER_CONVERSIONS,
+                  session: WorkbookSession = None):
+    # removing_duplicates only looks at single rows, so it is applied to every batch at load time
+    # the baby sheet tables are recreated and filled in one transaction, returns the number of loaded rows
+
+    if connection is not None:
+        connection.begin()
+
+    rows = 0
+    try:
+        if connection is not None:
+            create_replace_baby_sheet_tables(connection)
+        for batch, df in enumerate(stream_babies(first, last, skips, path, renaming_path, deleting_path, batch_size, session)):
+            df = removing_duplicates(df)
+            if parquet_path is not None:
+                append_parquet(df, parquet_path, batch, partition_cols)
+            if connection is not None:
+                insert_members(unpivot_members(df, members_path), connection)
+            rows += len(df)
+        if connection is not None:
+            connection.commit()
+    except Exception:
+        if connection is not None:
+            connection.rollback()
+        raise
+
+    return rows
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Synthetic babybiome questionnaire workbook (B### sheets and the general sheet) for benchmarks, labels come from the mapping files
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import argparse
+import random
+from datetime import datetime, timedelta
+import pandas as pd
+import openpyxl
+from openpyxl.comments import Comment
+
+from workbook_session import GENERAL_SHEET
+from mapping_registry import REGISTRY
+from value_normalization import BABY_VALUE_SPEC, GENERAL_VALUE_SPEC
+
+TIME_POINTS = 'time_point_conversions.csv'
+BABY_NOTES = ['Mutter Bifido', 'Kind Laktobazillen', 'Baby E. coli', 'vegetarisch', 'wenig Zucker', 'gestillt und Brei', 'Erkältung', 'seit 2 Wochen']
+GENERAL_NOTES = ['fleischarm', 'raucht seit 2020 nicht mehr', 'Allergie', 'Kaiserschnitt geplant']
+
+def mapping_labels(renaming_path: str):
+    # one questionnaire label per new column name, the label has to survive the renaming (later duplicates win there)
+
+    labels = {}
+    for old, new in REGISTRY.renaming(renaming_path).items():
+        if isinstance(new, str) and not old.endswith('_notes'):
+            labels.setdefault(new, old)
+
+    return labels
+
+def deleted_labels(deleting_path: str, n: int = 3):
+    return list(dict.fromkeys(label for label in REGISTRY.deleting(deleting_path) if not label.endswith('_notes')))[:n]
+
+def fake_baby_value(col: str, time_point: int, rng: random.Random):
+
+    if col.startswith('probe_date'):
+        return datetime(2024, 1, 1) + timedelta(days = 30 * time_point + rng.randint(0, 3)) if rng.random() < 0.9 else None
+    if col.startswith('bowels'):
+        return rng.choice(['Jeden Tag', 'Höchstens einmal pro Woche', 'Mehrmals pro Woche', None])
+    if col.startswith('food'):
+        return rng.choice(['gestillt', 'Pre-Milch', 'Beikost/Brei', 'gestillt, Aptamil', None])
+    if col.startswith(('weight', 'height')):
+        return round(rng.uniform(3, 80), 1)
+    if col == 'diet_baby':
+        return rng.choice(['nein', 'ja, vegetarisch', 'wenig Fleisch', None])
+    if col in BABY_VALUE_SPEC:
+        return rng.choice(['ja', 'nein', 'Ja', 'Nein', None])
+
+    return rng.choice(['Kommentar frei', 'Erkältung', None])
+
+def fake_general_value(col: str, rng: random.Random):
+
+    if col.endswith('_at_birth') and col.startswith('weight'):
+        return rng.randint(2500, 4500)
+    if col.startswith('weight'):
+        return rng.randint(50, 90)
+    if col.startswith(('height', 'geight')):
+        return rng.randint(45, 180)
+    if col in ('age_mother', 'number_of_children', 'sibling_number'):
+        return rng.randint(0, 40)
+    if col.startswith('birth_date'):
+        return datetime(2023, 1, 1) + timedelta(days = rng.randint(0, 300))
+    if col.startswith('smoking'):
+        return rng.choice(['nie', 'nein', 'ja', 'früher'])
+    if col == 'diet_family':
+        return rng.choice(['vegetarisch', 'keine', 'fleischarm'])
+    if col in GENERAL_VALUE_SPEC:
+        return rng.choice(['ja', 'nein', 'Nein'])
+
+    return rng.choice(['Text frei', 'keine', None])
+
+def add_baby_sheet(workbook, sheet: str, labels: dict, deleted: list, time_points: list, rng: random.Random, comment_rate: float):
+    # time point layout of rough_clean_baby/add_info_cols: english label, questionnaire label, one column per time point
+
+    worksheet = workbook.create_sheet(sheet)
+    worksheet.cell(1, 1, 'Questionnaire')
+    worksheet.cell(1, 2, 'Fragen')
+
+    filled = rng.randint(3, len(time_points)) # later time points are not reached yet, only their header is there
+    for t, time_point in enumerate(time_points):
+        worksheet.cell(1, 3 + t, f'Fragebogen "{time_point}"')
+
+    rows = list(labels.items()) + [(None, label) for label in deleted]
+    for r, (col, label) in enumerate(rows):
+        worksheet.cell(2 + r, 1, col)
+        worksheet.cell(2 + r, 2, label)
+        for t in range(filled):
+            cell = worksheet.cell(2 + r, 3 + t, fake_baby_value(col or '', t, rng))
+            if rng.random() < comment_rate:
+                cell.comment = Comment(rng.choice(BABY_NOTES), 'study team')
+
+def add_general_sheet(workbook, n_families: int, labels: dict, deleted: list, rng: random.Random, comment_rate: float):
+    # one column per family, the second row is dropped by rough_clean_general
+
+    worksheet = workbook.create_sheet(GENERAL_SHEET, 0)
+    worksheet.cell(1, 1, 'Questions')
+    worksheet.cell(1, 2, labels.pop('family', 'Fragen'))
+    worksheet.cell(2, 2, 'Fragebogen allgemein')
+    for j in range(n_families):
+        worksheet.cell(1, 3 + j, f'B{j + 1:03} Familie')
+
+    rows = list(labels.items()) + [(None, label) for label in deleted]
+    for r, (col, label) in enumerate(rows):
+        worksheet.cell(3 + r, 1, col)
+        worksheet.cell(3 + r, 2, label)
+        for j in range(n_families):
+            cell = worksheet.cell(3 + r, 3 + j, fake_general_value(col or '', rng))
+            if rng.random() < comment_rate:
+                cell.comment = Comment(rng.choice(GENERAL_NOTES), 'study team')
+
+def write_synthetic_workbook(path: str, n_babies: int, n_families: int = None, seed: int = 0, comment_rate: float = 0.1,
+                             baby_renaming: str = 'baby_sheet_renaming.xlsx', baby_deleting: str = 'baby_sheet_deleting.xlsx',
+                             general_renaming: str = 'general_renaming.xlsx', general_deleting: str = 'general_deleting.xlsx',
+                             time_points_path: str = TIME_POINTS):
+
+    if max(n_babies, n_families or 0) > 999:
+        raise ValueError('family ids are B### (add_baby_col), at most 999 babies/families')
+
+    rng = random.Random(seed)
+    time_points = pd.read_csv(time_points_path, sep = ';', encoding = 'utf-8-sig')['categorical'].to_list()
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    add_general_sheet(workbook, n_families or n_babies, mapping_labels(general_renaming), deleted_labels(general_deleting), rng, comment_rate)
+
+    labels, deleted = mapping_labels(baby_renaming), deleted_labels(baby_deleting)
+    for i in range(1, n_babies + 1):
+        add_baby_sheet(workbook, f'B{i:03}', labels, deleted, time_points, rng, comment_rate)
+
+    workbook.save(path)
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Writes a synthetic babybiome questionnaire workbook')
+    parser.add_argument('path')
+    parser.add_argument('babies', type = int)
+    parser.add_argument('--families', type = int)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--comment-rate', type = float, default = 0.1)
+    args = parser.parse_args()
+
+    write_synthetic_workbook(args.path, args.babies, args.families, args.seed, args.comment_rate)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Shared fixtures of the tests, the modules and the mapping files are used from the repository root
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import os
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from synthetic_workbook import write_synthetic_workbook
+
+@pytest.fixture(autouse = True)
+def in_repo(monkeypatch):
+    # the mapping files are read relative to the working directory
+    monkeypatch.chdir(REPO)
+
+@pytest.fixture(scope = 'session')
+def workbook(tmp_path_factory):
+    # 6 babies, every fourth cell commented
+
+    path = str(tmp_path_factory.mktemp('workbook') / 'synthetic.xlsx')
+    cwd = os.getcwd()
+    os.chdir(REPO)
+    try:
+        write_synthetic_workbook(path, 6, seed = 1, comment_rate = 0.25)
+    finally:
+        os.chdir(cwd)
+
+    return path
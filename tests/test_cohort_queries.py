@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Cohort queries of the current and an older snapshot on one connection
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import duckdb
+import pytest
+
+from cohort_queries import CohortQueries
+from execute_metadata_processing import run_pipeline
+from pipeline_instrumentation import RunLog
+
+def test_two_instances_on_one_connection(workbook, tmp_path):
+
+    database = str(tmp_path / 'cohorts.duckdb')
+    old = run_pipeline(workbook, 1, 6, [], database, snapshot = True, log = RunLog(trace_memory = False))[2].run_id
+    run_pipeline(workbook, 2, 6, [], database, snapshot = True, log = RunLog(trace_memory = False)) # the current snapshot has no B001
+
+    connection = duckdb.connect(database, read_only = True)
+    current = CohortQueries(connection)
+    assert current.family_samples('B001').num_rows == 0
+
+    with CohortQueries(connection, run_id = old) as older:
+        assert older.family_samples('B001').num_rows > 0
+        assert current.family_samples('B001').num_rows == 0
+        assert current.feeding_groups('vor').num_rows < older.feeding_groups('vor').num_rows
+
+    assert current.family_samples('B002').num_rows > 0 # closing the older one keeps the statements of the current one
+    with pytest.raises(ValueError):
+        older.family_samples('B001')
+    connection.close()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Merging shard files into a database that was loaded as snapshots
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import duckdb
+
+from cohort_shards import merge_duckdb_shards
+from execute_metadata_processing import run_pipeline
+from pipeline_instrumentation import RunLog
+from snapshot_loading import list_snapshots, current_run_id
+
+def test_merge_after_snapshot(workbook, tmp_path):
+
+    shard = str(tmp_path / 'site_a.duckdb')
+    run_pipeline(workbook, 1, 6, [], shard, log = RunLog(trace_memory = False))
+    database = str(tmp_path / 'merged.duckdb')
+    run_pipeline(workbook, 2, 6, [], database, snapshot = True, log = RunLog(trace_memory = False))
+
+    connection = duckdb.connect(database)
+    log = RunLog(trace_memory = False)
+    merge_duckdb_shards({'site_a': shard}, connection, log) # without snapshot = True
+
+    assert log.run_id is not None and current_run_id(connection) == log.run_id
+    assert len(list_snapshots(connection)) == 2
+    with duckdb.connect(shard, read_only = True) as source:
+        assert connection.sql('SELECT count(*) FROM collected_samples').fetchone() == source.sql('SELECT count(*) FROM collected_samples').fetchone()
+    connection.close()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Numeric rule values of the duplicate rules against numeric and object columns
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duplicate_rules import apply_duplicate_rules, load_duplicate_rules
+
+def rule(condition: str, value: str):
+    return pd.DataFrame({'baby': ['B034'], 'time_point': [np.nan], 'column': ['weight_mother'], 'condition': [condition], 'value': [value],
+                         'reason': ['test']})
+
+def sheet(weights: list, dtype):
+    return pd.DataFrame({'baby': ['B034'] * len(weights) + ['B035'], 'time_point': ['vor'] * (len(weights) + 1),
+                         'weight_mother': pd.array(weights + [75], dtype = dtype)})
+
+@pytest.mark.parametrize('weights, dtype', [([75, 80.5, None], 'Float64'), ([75, 80.5, None], object), (['75', 80.5, 'nicht gewogen'], object)])
+def test_numeric_value(weights, dtype):
+
+    df = sheet(weights, dtype)
+
+    assert list(apply_duplicate_rules(df, rule('==', '75')).index) == [1, 2, 3] # B035 has no rule
+    assert list(apply_duplicate_rules(df, rule('!=', '75')).index) == [0, 2, 3] # missing or text weights match neither
+
+def test_rule_file():
+    # the B034 rule of the shipped rule file on an object column
+
+    df = sheet([75, 'unbekannt'], object)
+    assert list(apply_duplicate_rules(df, load_duplicate_rules()).index) == [1, 2]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Incremental runs that only remove sheets or fail halfway end with the tables of a fresh load, new transform code extracts again
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import os
+import shutil
+
+import duckdb
+import pytest
+
+import incremental_etl
+from family_database import load_fingerprints
+
+MAPPINGS = ['baby_sheet_renaming.xlsx', 'baby_sheet_deleting.xlsx']
+TABLES = ['collected_samples', 'antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health']
+
+def table_rows(connection):
+    return {table: sorted(map(str, connection.sql(f'SELECT * FROM {table}').fetchall())) for table in TABLES}
+
+def failing_insert(*args):
+    raise RuntimeError('insert failed')
+
+def fresh_load(workbook: str, skips: list, tmp_path):
+
+    connection = duckdb.connect(str(tmp_path / 'fresh.duckdb'))
+    incremental_etl.run_incremental(1, 6, skips, workbook, *MAPPINGS, connection, str(tmp_path / 'fresh_cache'))
+    return connection
+
+@pytest.fixture
+def loaded(workbook, tmp_path):
+
+    connection = duckdb.connect(str(tmp_path / 'incremental.duckdb'))
+    incremental_etl.run_incremental(1, 6, [], workbook, *MAPPINGS, connection, str(tmp_path / 'cache'))
+    yield connection
+    connection.close()
+
+def test_remove_only(workbook, loaded, tmp_path):
+
+    _, changed, removed = incremental_etl.run_incremental(1, 6, [5, 6], workbook, *MAPPINGS, loaded, str(tmp_path / 'cache'))
+
+    assert (changed, removed) == ([], ['B005', 'B006'])
+    assert sorted(load_fingerprints(loaded)) == ['B001', 'B002', 'B003', 'B004']
+    assert table_rows(loaded) == table_rows(fresh_load(workbook, [5, 6], tmp_path))
+
+def test_failed_insert_is_repeated(workbook, loaded, tmp_path, monkeypatch):
+
+    loaded.sql("DELETE FROM sheet_fingerprints WHERE sheet = 'B002'") # B002 counts as changed
+    with monkeypatch.context() as patch:
+        patch.setattr(incremental_etl, 'insert_baby_sheets', failing_insert)
+        with pytest.raises(RuntimeError):
+            incremental_etl.run_incremental(1, 6, [3], workbook, *MAPPINGS, loaded, str(tmp_path / 'cache'))
+
+    _, changed, removed = incremental_etl.run_incremental(1, 6, [3], workbook, *MAPPINGS, loaded, str(tmp_path / 'cache'))
+
+    assert (changed, removed) == (['B002'], ['B003'])
+    assert table_rows(loaded) == table_rows(fresh_load(workbook, [3], tmp_path))
+
+def test_new_code_extracts_again(workbook, tmp_path, monkeypatch):
+
+    path = str(tmp_path / 'copy.xlsx')
+    shutil.copy(workbook, path)
+    connection = duckdb.connect(str(tmp_path / 'versions.duckdb'))
+    incremental_etl.run_incremental(1, 6, [], path, *MAPPINGS, connection) # the default cache sits next to the workbook
+    assert sorted(os.listdir(tmp_path / incremental_etl.CACHE_DIR / 'copy')) == [f'B00{i}.pkl' for i in range(1, 7)]
+    assert incremental_etl.run_incremental(1, 6, [], path, *MAPPINGS, connection)[1] == []
+
+    monkeypatch.setattr(incremental_etl, 'transform_version', lambda: 'upgraded')
+    _, changed, removed = incremental_etl.run_incremental(1, 6, [], path, *MAPPINGS, connection)
+
+    assert (changed, removed) == ([f'B00{i}' for i in range(1, 7)], [])
+    connection.close()
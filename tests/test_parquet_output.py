@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Partitioned baby sheet datasets of the whole frame and of the streamed batches hold the same rows
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import glob
+
+import duckdb
+
+from execute_metadata_processing import run_pipeline
+from pipeline_instrumentation import RunLog
+
+def dataset_rows(output: str):
+
+    path = glob.glob(f'{output}*_baby_sheets')[0]
+    return duckdb.sql(f"SELECT baby, count(*) FROM read_parquet('{path}/**/*.parquet', hive_partitioning = true) GROUP BY baby ORDER BY baby").fetchall()
+
+def test_partitioned_by_baby(workbook, tmp_path):
+
+    whole, streamed = str(tmp_path / 'whole_'), str(tmp_path / 'streamed_')
+    babies = run_pipeline(workbook, 1, 6, [], output = whole, file_format = 'parquet', log = RunLog(trace_memory = False),
+                          partition_cols = ['baby'])[0]
+    run_pipeline(workbook, 1, 6, [], output = streamed, file_format = 'parquet', log = RunLog(trace_memory = False), batch_size = 2,
+                 partition_cols = ['baby'])
+
+    assert [baby for baby, _ in dataset_rows(whole)] == sorted(babies['baby'].unique())
+    assert dataset_rows(whole) == dataset_rows(streamed)
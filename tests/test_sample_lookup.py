@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' The lookup does not block loads of other processes and its cache follows them, for main and for snapshots
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import subprocess
+import sys
+
+import pytest
+
+from execute_metadata_processing import run_pipeline
+from pipeline_instrumentation import RunLog
+from sample_lookup import SampleLookup
+
+def write_from_other_process(database: str, sql: str):
+    # fails with "Could not set lock" while any connection of this process holds the file
+
+    subprocess.run([sys.executable, '-c', f'import duckdb; connection = duckdb.connect({database!r}); connection.sql({sql!r}); connection.close()'],
+                   check = True)
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_loads_between_lookups(workbook, tmp_path, snapshot):
+
+    database = str(tmp_path / 'lookup.duckdb')
+    run_pipeline(workbook, 1, 6, [], database, snapshot = snapshot, log = RunLog(trace_memory = False))
+
+    with SampleLookup(database) as lookup:
+        ids = lookup.get_records(family = 'B001')
+        ids = [row['sample_id'] for row in ids][:3]
+        before = lookup.get_samples(ids)
+        assert list(before['sample_id']) == ids
+
+        if snapshot: # a new snapshot without B001
+            run_pipeline(workbook, 2, 6, [], database, snapshot = True, log = RunLog(trace_memory = False))
+            assert lookup.get_samples(ids).empty
+        else:
+            write_from_other_process(database, f"UPDATE collected_samples SET sampling_notes = 'retaken' WHERE sample_id = '{ids[0]}'")
+            after = lookup.get_samples(ids)
+            assert list(after['sampling_notes'])[0] == 'retaken'
+            assert after.drop(columns = 'sampling_notes').equals(before.drop(columns = 'sampling_notes'))
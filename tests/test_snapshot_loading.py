@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' A database loaded with --snapshot stays loadable by the runs without it
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import duckdb
+import pytest
+
+from execute_metadata_processing import run_pipeline, BABY_RENAMING, BABY_DELETING
+from incremental_etl import run_incremental
+from pipeline_instrumentation import RunLog
+from snapshot_loading import list_snapshots, current_run_id
+
+def samples(database: str):
+
+    connection = duckdb.connect(database, read_only = True)
+    try:
+        return connection.sql('SELECT count(*) FROM collected_samples').fetchone()[0]
+    finally:
+        connection.close()
+
+def test_plain_run_after_snapshot(workbook, tmp_path):
+
+    database = str(tmp_path / 'snapshots.duckdb')
+    run_pipeline(workbook, 1, 6, [], database, snapshot = True, log = RunLog(trace_memory = False))
+    expected = samples(database)
+
+    _, _, log = run_pipeline(workbook, 1, 5, [], database, log = RunLog(trace_memory = False)) # without --snapshot
+    streamed = run_pipeline(workbook, 1, 6, [], database, batch_size = 2, log = RunLog(trace_memory = False))[2]
+
+    connection = duckdb.connect(database, read_only = True)
+    assert len(list_snapshots(connection)) == 3
+    assert current_run_id(connection) == streamed.run_id and log.run_id is not None
+    connection.close()
+    assert samples(database) == expected
+
+def test_incremental_refuses_snapshots(workbook, tmp_path):
+
+    database = str(tmp_path / 'snapshots.duckdb')
+    run_pipeline(workbook, 1, 6, [], database, snapshot = True, log = RunLog(trace_memory = False))
+
+    connection = duckdb.connect(database)
+    with pytest.raises(ValueError, match = 'snapshots'):
+        run_incremental(1, 6, [], workbook, BABY_RENAMING, BABY_DELETING, connection, str(tmp_path / 'cache'))
+    connection.close()
+
+    run_pipeline(workbook, 1, 6, [], database, log = RunLog(trace_memory = False))
+    assert samples(database) > 0
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Streamed batches against the full pipeline, for a batch without an optional question and a batch without any date
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import duckdb
+import openpyxl
+import pandas as pd
+import pytest
+
+from mapping_registry import REGISTRY
+from babysheet_extract_transform import run_through_babies, clean_and_edit_baby
+from family_database import unpivot_members
+from execute_metadata_processing import load_baby_tables, BABY_RENAMING, BABY_DELETING
+from streaming_etl import run_streaming
+
+TABLES = ['collected_samples', 'antibiotics', 'probiotics', 'baby_diet', 'baby_health', 'mother_health']
+
+def question_rows(worksheet, cols: list):
+    # rows of the questions renamed to one of cols
+
+    renaming = REGISTRY.renaming(BABY_RENAMING)
+    return [row[0].row for row in worksheet.iter_rows(min_col = 2, max_col = 2) if renaming.get(row[0].value) in cols]
+
+def uneven_workbook(workbook: str, path: str, case: str):
+    # B001 and B002 (the first batch) without the question of probe_date_sib2 or without any date
+
+    renaming = REGISTRY.renaming(BABY_RENAMING)
+    book = openpyxl.load_workbook(workbook)
+    for sheet in ['B001', 'B002']:
+        worksheet = book[sheet]
+        if case == 'missing question':
+            for row in sorted(question_rows(worksheet, ['probe_date_sib2']), reverse = True):
+                worksheet.delete_rows(row)
+        else:
+            dates = [col for col in renaming.values() if col.startswith('probe_date_') and not col.endswith('_notes')]
+            for row in question_rows(worksheet, dates):
+                for cell in worksheet[row][2:]:
+                    cell.value = None
+    book.save(path)
+
+    return path
+
+@pytest.mark.parametrize('case', ['missing question', 'no dates'])
+def test_batches_equal_full_run(workbook, tmp_path, case):
+
+    path = uneven_workbook(workbook, str(tmp_path / 'uneven.xlsx'), case)
+    full = clean_and_edit_baby(run_through_babies(1, 6, [], path, BABY_RENAMING, BABY_DELETING))
+    expected = duckdb.connect()
+    load_baby_tables(unpivot_members(full), expected)
+
+    streamed = duckdb.connect()
+    rows = run_streaming(1, 6, [], path, BABY_RENAMING, BABY_DELETING, streamed, batch_size = 2)
+
+    assert rows == len(full)
+    for table in TABLES:
+        pd.testing.assert_frame_equal(streamed.sql(f'SELECT * FROM {table} ORDER BY sample_id').df(),
+                                      expected.sql(f'SELECT * FROM {table} ORDER BY sample_id').df())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' KeywordRules against the per cell conditions and str.contains calls they replaced, on texts with overlapping keywords and mixed case
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from text_classifier import DIET, SMOKING, FEEDING, PROBIOTICS, DIET_RULES, SMOKING_RULES, FEEDING_RULES, PROBIOTICS_RULES
+
+def legacy_diet(notes):
+    # diet_condition of babysheet_extract_transform
+
+    notes = notes.lower()
+    diet = []
+
+    if 'fleischarm' in notes or 'wenig fleisch' in notes:
+        diet.append('less meat')
+    if 'vege' in notes:
+        diet.append('vegetarian')
+    if 'vega' in notes:
+        diet.append('vegan')
+    if 'salz' in notes:
+        diet.append('less salt')
+    if 'zucker' in notes:
+        diet.append('low sugar')
+    if 'carb' in notes or 'kohlenhydr' in notes:
+        diet.append('low carb')
+    if 'eiwei' in notes:
+        diet.append('little egg???')
+    if 'pesce' in notes:
+        diet.append('pescetarian')
+
+    return diet
+
+def legacy_smoking(row):
+    # smoking_conditional of general_sheet_extract_transform
+
+    if 'nie' in row:
+        return 'never'
+    elif 'nein' in row:
+        return 'no'
+    elif 'ja' in row:
+        return 'yes'
+    elif 'früher' in row:
+        return 'previously'
+    else:
+        return pd.NA
+
+def legacy_feeding(temp: pd.Series):
+    # edit_baby_feeding_mode, columns and the row wise feeding_mode_conditional
+
+    columns = pd.DataFrame({'breastfed': temp.str.contains(r'gestil', case = False),
+                            'formula': temp.str.contains(r'milch|pre|aptamil', case = False, regex = True),
+                            'solids': temp.str.contains(r'beikost|brei', case = False, regex = True)})
+    modes = columns.apply(lambda row: [label for label in ['breastfed', 'formula', 'solids'] if row[label]], axis = 1)
+
+    return columns, modes
+
+def legacy_probiotics(notes: pd.Series):
+    # edit_probiotics
+
+    patterns = {'probiotics_mother': r'mutter', 'probiotics_sib1': r'kind', 'probiotics_sib2': r'child', 'probiotics_father': r'vater',
+                'probiotics_baby1': r'baby', 'probiotics_baby2': r'infant', 'probiotics_bifido': r'[\S\s]*bifido[\S\s]*',
+                'probiotics_lakt': r'[\S\s]*lakt[\S\s]*', 'probiotics_e_coli': r'[\S\s]*coli[\S\s]*'}
+    return pd.DataFrame({label: notes.str.contains(pattern, case = False, regex = True) for label, pattern in patterns.items()})
+
+def random_texts(rules: list, n: int = 400, seed: int = 0):
+    # keywords of all rules glued together and with filler, every character randomly upper or lower case
+
+    random.seed(seed)
+    words = [word for _, keywords in rules for word in keywords] + ['früher', 'nein', 'ja', 'milch', 'pre', 'vegan', 'vegetarisch']
+    fillers = ['', ' ', 'x', ', ', 'nan', 'und ']
+    texts = []
+    for _ in range(n):
+        text = ''.join(random.choice(words) + random.choice(fillers) for _ in range(random.randint(0, 4)))
+        texts.append(''.join(c.upper() if random.random() < 0.3 else c for c in text))
+
+    return texts
+
+FIXED_TEXTS = ['vegan', 'Vegetarisch, vegan am Wochenende', 'wenig Fleisch, kein Salz', 'FLEISCHARM', 'Kohlenhydratarm, low carb',
+               'eiweißreich', 'pescetarisch', 'zuckerfrei', 'nanNein', 'Ja, früher nie', 'nie', 'NEIN', 'nannan', 'früher ja', 'Früher',
+               'Aptamil Pre', 'premilch', 'gestillt + Beikost', 'Babybrei', 'Muttermilch', 'kindermilch', 'Lakto Bifidobakterien für Mutter und Kind',
+               'E. Coli (Mutaflor) child', 'Vater und Baby', 'infant drops', '']
+
+def series(texts: list):
+    return pd.Series(texts + [np.nan, None, 5], index = range(10, 13 + len(texts)), dtype = object)
+
+@pytest.mark.parametrize('texts', [FIXED_TEXTS, random_texts(DIET_RULES)])
+def test_diet(texts):
+
+    notes = series(texts).astype(str) # edit_baby_diet and edit_family_diet join the cells as strings
+    expected = notes.apply(legacy_diet)
+
+    pd.testing.assert_series_equal(DIET.label_lists(notes), expected)
+
+@pytest.mark.parametrize('texts', [FIXED_TEXTS, random_texts(SMOKING_RULES)])
+def test_smoking(texts):
+
+    notes = series(texts).astype(str)
+    expected = notes.apply(legacy_smoking)
+
+    pd.testing.assert_series_equal(SMOKING.first_label(notes), expected)
+
+@pytest.mark.parametrize('texts', [FIXED_TEXTS, random_texts(FEEDING_RULES)])
+def test_feeding(texts):
+
+    temp = series(texts).astype(str)
+    columns, modes = legacy_feeding(temp)
+
+    pd.testing.assert_frame_equal(FEEDING.classify(temp), columns)
+    pd.testing.assert_series_equal(FEEDING.label_lists(temp), modes)
+
+@pytest.mark.parametrize('texts', [FIXED_TEXTS, random_texts(PROBIOTICS_RULES)])
+def test_probiotics(texts):
+
+    notes = series(texts) # the notes are not joined, missing notes stay NaN or None
+    expected = legacy_probiotics(notes)
+
+    pd.testing.assert_frame_equal(PROBIOTICS.classify(notes), expected)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Categories and ENUMs follow a changed conversion csv without restarting the process (watch mode)
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import shutil
+
+import duckdb
+
+from typed_schema import TIME_CONVERSIONS, MEMBER_CONVERSIONS, time_point_categories, time_point_days, extraction_types
+from family_database import create_replace_baby_sheet_tables
+from load_validation import table_schemas
+
+def test_changed_time_points(tmp_path):
+
+    path = str(tmp_path / 'time_point_conversions.csv')
+    shutil.copy(TIME_CONVERSIONS, path)
+    before = time_point_categories(path)
+    assert '36Monate' not in before and '36Monate' not in extraction_types(path)['time_point'].categories
+
+    with open(path, 'a', encoding = 'utf-8') as file:
+        file.write('\n36Monate;36;1095;156,4;36M;10')
+
+    assert time_point_categories(path) == before + ('36Monate',)
+    assert time_point_days(path)['36Monate'] == 1095
+    assert list(extraction_types(path)['time_point'].categories) == list(before) + ['36Monate']
+
+    connection = duckdb.connect()
+    create_replace_baby_sheet_tables(connection, path, MEMBER_CONVERSIONS)
+    assert connection.sql('SELECT enum_range(NULL::time_point_enum)').fetchone()[0][-1] == '36Monate'
+
+    columns, _ = table_schemas(path, MEMBER_CONVERSIONS)
+    time_point = next(col for col in columns['collected_samples'] if col['column'] == 'time_point')
+    assert time_point['labels'][-1] == '36Monate'
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Values and notes of WorkbookSession against the former openpyxl walk over every cell comment
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from workbook_session import WorkbookSession, GENERAL_SHEET
+from general_sheet_extract_transform import read_general_sheet
+
+def legacy_notes(path: str, sheet: str):
+    # the comment walk the session replaced (load_baby_sheet_notes / load_general_sheet_notes)
+
+    workbook = openpyxl.load_workbook(path)
+    worksheet = workbook[sheet]
+    normal = pd.DataFrame(worksheet.values) # for column labels
+
+    for row in worksheet.iter_rows():
+        for cell in row:
+            cell.value = cell.comment.text if cell.comment else None
+
+    notes = pd.DataFrame(worksheet.values)
+    notes.iloc[:, 1] = normal.iloc[:, 1] + "_notes" # adds column labels back
+    if sheet == GENERAL_SHEET:
+        notes.iloc[0, 2:] = normal.iloc[0, 2:] # adds baby labels back
+
+    return notes
+
+@pytest.mark.parametrize('sheet', ['B001', 'B004', 'B006'])
+def test_baby_sheet(workbook, sheet):
+
+    with WorkbookSession(workbook) as session:
+        normal, notes = session.read_sheet(sheet)
+
+    pd.testing.assert_frame_equal(normal, pd.read_excel(workbook, sheet_name = sheet, header = None))
+    pd.testing.assert_frame_equal(notes, legacy_notes(workbook, sheet))
+    assert notes.iloc[:, 2:].notna().any().any() # the sheet has comments at all
+
+def test_general_sheet(workbook):
+
+    with WorkbookSession(workbook) as session:
+        normal, notes = read_general_sheet(session)
+
+    pd.testing.assert_frame_equal(normal, pd.read_excel(workbook, sheet_name = GENERAL_SHEET, header = None))
+    pd.testing.assert_frame_equal(notes, legacy_notes(workbook, GENERAL_SHEET))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Keyword rules for the free text answers and notes of the babybiome questionnaires (diet, smoking, feeding, probiotics)
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import re
+
+from lazy_imports import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+# (label, keywords), the order is the order of the labels in lists and the priority for the first label
+DIET_RULES = [('less meat', ['fleischarm', 'wenig fleisch']),
+              ('vegetarian', ['vege']),
+              ('vegan', ['vega']),
+              ('less salt', ['salz']),
+              ('low sugar', ['zucker']),
+              ('low carb', ['carb', 'kohlenhydr']),
+              ('little egg???', ['eiwei']),
+              ('pescetarian', ['pesce'])]
+
+SMOKING_RULES = [('never', ['nie']),
+                 ('no', ['nein']),
+                 ('yes', ['ja']),
+                 ('previously', ['früher'])]
+
+FEEDING_RULES = [('breastfed', ['gestil']),
+                 ('formula', ['milch', 'pre', 'aptamil']),
+                 ('solids', ['beikost', 'brei'])]
+
+PROBIOTICS_RULES = [('probiotics_mother', ['mutter']),
+                    ('probiotics_sib1', ['kind']),
+                    ('probiotics_sib2', ['child']),
+                    ('probiotics_father', ['vater']),
+                    ('probiotics_baby1', ['baby']),
+                    ('probiotics_baby2', ['infant']),
+                    ('probiotics_bifido', ['bifido']),
+                    ('probiotics_lakt', ['lakt']),
+                    ('probiotics_e_coli', ['coli'])]
+
+class KeywordRules:
+    # all keywords of a rule set in one regex, every distinct text is scanned once
+    # case: 'lower' lowercases the text (like str.lower), 'ignore' matches case insensitive (like str.contains(case = False)), 'exact' as is
+
+    def __init__(self, rules: list, case: str = 'ignore'):
+
+        self.labels = [label for label, _ in rules]
+        self.case = case
+        fold = str.lower if case == 'ignore' else (lambda word: word)
+
+        keywords = {}
+        for i, (_, words) in enumerate(rules):
+            for word in words:
+                keywords.setdefault(fold(word), set()).add(i)
+
+        # longest keyword first, all keywords that are a prefix of the matched one match at that position as well
+        self.keywords = sorted(keywords, key = len, reverse = True)
+        self.hits = [frozenset(i for other, labels in keywords.items() if word.startswith(other) for i in labels) for word in self.keywords]
+        alternation = '|'.join(f'({re.escape(word)})' for word in self.keywords)
+        self.pattern = re.compile(f'(?=(?:{alternation}))', re.IGNORECASE if case == 'ignore' else 0)
+
+    def match(self, text: str):
+        # indices of the matching rules
+
+        if self.case == 'lower':
+            text = text.lower()
+        found = set()
+        for match in self.pattern.finditer(text):
+            found |= self.hits[match.lastindex - 1]
+
+        return found
+
+    def match_distinct(self, series: pd.Series):
+        # codes into the distinct values, their matches and where there was no text
+
+        codes, uniques = pd.factorize(series)
+        matches = [self.match(text) if isinstance(text, str) else None for text in uniques]
+        missing = np.array([found is None for found in matches] + [True])[codes] # code -1 picks the appended True
+
+        return codes, matches, missing
+
+    def classify(self, series: pd.Series):
+        # one boolean column per label, the missing value (NaN, None) where there was no text (like str.contains)
+
+        codes, matches, missing = self.match_distinct(series)
+        table = np.array([[found is not None and i in found for i in range(len(self.labels))] for found in matches] + [[False] * len(self.labels)], dtype = bool)
+        values = table[codes]
+        texts = series.to_numpy(dtype = object)
+
+        result = {}
+        for i, label in enumerate(self.labels):
+            column = values[:, i]
+            if missing.any():
+                column = column.astype(object)
+                column[missing] = np.where(pd.isna(texts[missing]), texts[missing], np.nan) # numbers are not text either
+            result[label] = column
+
+        return pd.DataFrame(result, index = series.index)
+
+    def label_lists(self, series: pd.Series):
+        # list of the matching labels in rule order per row
+
+        codes, matches, _ = self.match_distinct(series)
+        lists = [[label for i, label in enumerate(self.labels) if i in (found or ())] for found in matches] + [[]]
+
+        return pd.Series([list(lists[code]) for code in codes], index = series.index, dtype = object)
+
+    def first_label(self, series: pd.Series, default = None):
+        # highest priority label per row, pd.NA (or default) where nothing matched
+
+        default = pd.NA if default is None else default
+        codes, matches, _ = self.match_distinct(series)
+        first = [self.labels[min(found)] if found else default for found in matches] + [default]
+
+        return pd.Series([first[code] for code in codes], index = series.index, dtype = object)
+
+DIET = KeywordRules(DIET_RULES, case = 'lower')
+SMOKING = KeywordRules(SMOKING_RULES, case = 'exact')
+FEEDING = KeywordRules(FEEDING_RULES, case = 'ignore')
+PROBIOTICS = KeywordRules(PROBIOTICS_RULES, case = 'ignore')
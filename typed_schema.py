@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Categorical dtypes with fixed category sets for the repeating columns of the babybiome metadata (babies, time points, members, answers)
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import inspect
+from functools import lru_cache, wraps
+
+from lazy_imports import LazyModule
+from mapping_registry import REGISTRY, file_stamp
+from value_normalization import FREQUENCY_BABY, MEMBERS
+from text_classifier import SMOKING
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+TIME_CONVERSIONS = 'time_point_conversions.csv'
+MEMBER_CONVERSIONS = 'family_member_conversions.csv'
+
+BABY_IDS = [f'B{i:03}' for i in range(1, 1000)] # sheet names and family ids, see run_through_babies
+FREQUENCIES = [value for _, value in FREQUENCY_BABY]
+
+def mapping_cache(*path_params):
+    # lru_cache also keyed on the stamps of the mapping files passed as path_params, a changed conversion csv (e.g. in watch mode)
+    # gives new categories and with them new ENUMs when the tables are recreated
+
+    def decorator(function):
+        signature = inspect.signature(function)
+        cached = lru_cache(maxsize = 16)(lambda stamps, *args: function(*args))
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return cached(tuple(file_stamp(bound.arguments[param]) for param in path_params), *bound.args)
+
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+
+    return decorator
+
+@mapping_cache('path')
+def time_point_categories(path: str = TIME_CONVERSIONS):
+    # chronological, so sorting by time point sorts by age
+
+    times = pd.DataFrame(REGISTRY.conversions(path))
+    return tuple(times.sort_values('days', kind = 'stable')['categorical'])
+
+@mapping_cache('path')
+def time_point_days(path: str = TIME_CONVERSIONS):
+    # time point -> days since birth, the numeric key of collected_samples (vor is -1)
+
+    times = REGISTRY.conversions(path)
+    return dict(zip(times['categorical'], times['days']))
+
+@mapping_cache('path')
+def member_categories(path: str = MEMBER_CONVERSIONS, col: str = 'one_letter'):
+
+    members = pd.DataFrame(REGISTRY.conversions(path))
+    return tuple(members.sort_values('number')[col])
+
+@mapping_cache('times_path')
+def extraction_types(times_path: str = TIME_CONVERSIONS):
+    # known right after extraction, applied when the sheets are merged
+    return {'baby': pd.CategoricalDtype(BABY_IDS),
+            'time_point': pd.CategoricalDtype(time_point_categories(times_path), ordered = True)}
+
+@mapping_cache('times_path')
+def baby_sheet_types(times_path: str = TIME_CONVERSIONS):
+    # frequencies only after replacing_values_baby
+    return {**extraction_types(times_path), **{f'bowels_{member}': pd.CategoricalDtype(FREQUENCIES) for member in MEMBERS}}
+
+@lru_cache
+def general_sheet_types():
+    return {'smoking_father': pd.CategoricalDtype(SMOKING.labels), 'smoking_mother': pd.CategoricalDtype(SMOKING.labels)}
+
+def to_categorical(series: pd.Series, dtype: pd.CategoricalDtype):
+    # a column with values outside the fixed categories is left as it is, nothing is turned into NA
+
+    if isinstance(series.dtype, pd.CategoricalDtype) and series.dtype == dtype:
+        return series
+    if not series.dropna().isin(dtype.categories).all():
+        return series
+
+    return series.astype(dtype)
+
+def apply_types(df: pd.DataFrame, types: dict):
+
+    for col, dtype in types.items():
+        for i in np.flatnonzero(df.columns == col): # positions, a label can occur twice after renaming
+            df.isetitem(i, to_categorical(df.iloc[:, i], dtype))
+
+    return df
+
+def enum_values(categories):
+    # sql literal list of an ENUM type
+    return ', '.join("'" + str(value).replace("'", "''") + "'" for value in categories)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Normalization of the yes/no and frequency answers of the babybiome questionnaires, per column and per distinct value
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import re
+
+from lazy_imports import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+def compile_rules(rules: list):
+    return [(re.compile(pattern), value) for pattern, value in rules]
+
+# (pattern, value) applied in order, like the former DataFrame.replace(regex = True) passes
+YES_NO_BABY = compile_rules([(r'.*[Jj][Aa].*', 'True'), (r'.*[Nn][Ee][Ii][Nn].*', 'False')])
+FREQUENCY_BABY = compile_rules([(r'.*[Jj]eden.*', 'min. once per day'), (r'.*[Hh]öchstens.*', 'max. once per week'), (r'.*[Mm]ehrmal.*', 'several times a week')])
+YES_NO_GENERAL = compile_rules([(r'[Jj][Aa]', 'True'), (r'[Nn][Ee][Ii][Nn]', 'False')])
+
+MEMBERS = ['father', 'mother', 'sib1', 'sib2', 'baby1', 'baby2']
+
+# column -> rules, columns that are not in a sheet are skipped, all other columns (notes, dates, free text) are left alone
+BABY_VALUE_SPEC = {**{col: YES_NO_BABY for col in ['kit_both', 'kit_oral', 'kit_faecal', 'household_size_increase', 'household_size_decrease',
+                                                  'pacifier_baby1', 'pacifier_baby2', 'illness_baby1', 'illness_baby2', 'hospital_baby1',
+                                                  'u_untersuchung_abnormalities', 'probiotics', 'diabetes_mother', 'diabetes_treatment_reqd']},
+                   **{f'antibiotics_{member}': YES_NO_BABY for member in MEMBERS},
+                   **{f'bowels_{member}': FREQUENCY_BABY for member in MEMBERS}}
+
+GENERAL_VALUE_SPEC = {col: YES_NO_GENERAL for col in ['alcohol_pregnancy', 'gestational_diabetes', 'gestational_diabetes_previous',
+                                                      'lactose_intolerance', 'celiac_disease', 'multiple_birth', 'water_birth', 'sampled_at_birth', 'father_participation',
+                                                      'antibiotics_baby1_at_birth', 'antibiotics_baby2_at_birth',
+                                                      'probiotics_baby1_at_birth', 'probiotics_baby2_at_birth']}
+
+def apply_rules(value, rules: list):
+    # same result as the regex replace for one cell, only strings are touched
+
+    if not isinstance(value, str):
+        return value
+    for pattern, replacement in rules:
+        value = pattern.sub(replacement, value)
+
+    return value
+
+def normalize_values(series: pd.Series, rules: list):
+    # every distinct value is matched once and mapped back onto the rows
+
+    codes, uniques = pd.factorize(series)
+    normalized = [apply_rules(value, rules) for value in uniques]
+    if normalized == list(uniques):
+        return series
+
+    values = np.array(normalized + [None], dtype = object)[codes]
+    missing = codes == -1
+    values[missing] = series.to_numpy(dtype = object)[missing] # keeps None and NaN as they were
+
+    return pd.Series(values, index = series.index, name = series.name)
+
+def normalize_frame(df: pd.DataFrame, spec: dict):
+
+    for col, rules in spec.items():
+        for i in np.flatnonzero(df.columns == col): # positions, a label can occur twice after renaming
+            df.isetitem(i, normalize_values(df.iloc[:, i], rules))
+
+    return df
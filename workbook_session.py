@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Single-open access to the babybiome questionnaire workbook (values and cell comments of every sheet)
+    @Author: LRB
+    @Date: 18.10.2026'''
+
+from __future__ import annotations
+
+import hashlib
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+from lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+cell_utils = LazyModule('openpyxl.utils.cell')
+
+GENERAL_SHEET = 'Fragebogen-allgemein+Geburt'
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def _part_path(base: str, target: str):
+    # relationship targets are either absolute in the package or relative to the part
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+def _relationships(archive: zipfile.ZipFile, part: str):
+
+    rels_path = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    if rels_path not in archive.namelist():
+        return {}
+
+    root = ElementTree.fromstring(archive.read(rels_path))
+    return {rel.get('Id'): (rel.get('Type'), _part_path(part, rel.get('Target'))) for rel in root.iter(PACKAGE_REL_NS + 'Relationship')}
+
+def sheet_parts(archive: zipfile.ZipFile):
+    # sheet name -> worksheet xml part, via workbook.xml and its relationships
+
+    workbook_rels = _relationships(archive, 'xl/workbook.xml')
+    root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+
+    return {sheet.get('name'): workbook_rels[sheet.get(REL_NS + 'id')][1] for sheet in root.iter(MAIN_NS + 'sheet')}
+
+def comments_part(archive: zipfile.ZipFile, sheet_part: str):
+
+    for rel_type, target in _relationships(archive, sheet_part).values():
+        if rel_type.endswith('/comments'):
+            return target
+
+    return None
+
+def read_comments(archive: zipfile.ZipFile, part: str):
+    # streams the comments xml, text is put together like openpyxl does (plain text + all rich text runs)
+
+    comments = {}
+
+    with archive.open(part) as comments_xml:
+        for _, element in ElementTree.iterparse(comments_xml):
+            if element.tag != MAIN_NS + 'comment':
+                continue
+            text = element.find(MAIN_NS + 'text')
+            snippets = [t.text or '' for t in text.findall(MAIN_NS + 't')]
+            snippets += [t.text or '' for t in text.findall(MAIN_NS + 'r/' + MAIN_NS + 't')]
+            row, col = cell_utils.coordinate_to_tuple(element.get('ref'))
+            comments[(row - 1, col - 1)] = ''.join(snippets)
+            element.clear()
+
+    return comments
+
+def read_shared_strings(archive: zipfile.ZipFile):
+
+    parts = [target for rel_type, target in _relationships(archive, 'xl/workbook.xml').values() if rel_type.endswith('/sharedStrings')]
+    if not parts:
+        return []
+
+    strings = []
+    with archive.open(parts[0]) as strings_xml:
+        for _, element in ElementTree.iterparse(strings_xml):
+            if element.tag != MAIN_NS + 'si':
+                continue
+            snippets = [t.text or '' for t in element.findall(MAIN_NS + 't')]
+            snippets += [t.text or '' for t in element.findall(MAIN_NS + 'r/' + MAIN_NS + 't')]
+            strings.append(''.join(snippets))
+            element.clear()
+
+    return strings
+
+def sheet_fingerprint(archive: zipfile.ZipFile, sheet_part: str, shared_strings: list):
+    # hash of the cell contents (shared strings resolved, indices shift between saves) and the comments
+
+    hasher = hashlib.sha256()
+
+    with archive.open(sheet_part) as sheet_xml:
+        for _, element in ElementTree.iterparse(sheet_xml):
+            if element.tag == MAIN_NS + 'c':
+                value = element.findtext(MAIN_NS + 'v')
+                if element.get('t') == 's' and value is not None:
+                    value = shared_strings[int(value)]
+                elif element.get('t') == 'inlineStr':
+                    value = ''.join(t.text or '' for t in element.iter(MAIN_NS + 't'))
+                hasher.update(f"{element.get('r')}\x1f{value}\x1e".encode('utf-8'))
+                element.clear()
+            elif element.tag == MAIN_NS + 'row':
+                element.clear()
+
+    part = comments_part(archive, sheet_part)
+    if part is not None:
+        hasher.update(archive.read(part))
+
+    return hasher.hexdigest()
+
+def comments_to_notes(comments: dict, normal: pd.DataFrame):
+    # notes frame in the shape of the values frame, only the commented cells are filled
+
+    n_rows = max([normal.shape[0]] + [row + 1 for row, _ in comments])
+    n_cols = max([normal.shape[1]] + [col + 1 for _, col in comments])
+    notes = np.full((n_rows, n_cols), None, dtype = object)
+    for (row, col), text in comments.items():
+        notes[row, col] = text
+
+    notes = pd.DataFrame(notes)
+    notes.iloc[:, 1] = normal.iloc[:, 1] + "_notes" # adds column labels back
+
+    return notes
+
+class WorkbookSession:
+    # opens the workbook once, every sheet is then read from it instead of reopening the file
+
+    def __init__(self, path: str):
+        self.path = path
+        self.excel = pd.ExcelFile(path, engine = 'openpyxl') # read only, sheets are only parsed when requested
+        self.archive = zipfile.ZipFile(path)
+        self.sheet_parts = sheet_parts(self.archive)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.excel.close()
+        self.archive.close()
+
+    def load_sheet(self, sheet: str):
+        return self.excel.parse(sheet, header = None)
+
+    def load_sheet_comments(self, sheet: str):
+
+        part = comments_part(self.archive, self.sheet_parts[sheet])
+        if part is None:
+            return {}
+
+        return read_comments(self.archive, part)
+
+    def load_sheet_notes(self, sheet: str, normal: pd.DataFrame):
+        return comments_to_notes(self.load_sheet_comments(sheet), normal)
+
+    def read_sheet(self, sheet: str):
+
+        normal = self.load_sheet(sheet)
+        return normal, self.load_sheet_notes(sheet, normal)
+
+    def fingerprints(self, sheets: list):
+
+        shared_strings = read_shared_strings(self.archive)
+        return {sheet: sheet_fingerprint(self.archive, self.sheet_parts[sheet], shared_strings) for sheet in sheets}